@@ -14,16 +14,26 @@ from pathlib import Path
 # Define el directorio base del proyecto.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+# Toma una sola instantánea del entorno para todas las lecturas de este módulo.
+_env = os.environ.copy()
+
+
+def _env_int(key: str, default: int) -> int:
+    """Lee una variable de entorno entera; usa el default si está vacía."""
+    value = _env.get(key)
+    return int(value) if value else default
+
+
 # Configuración de seguridad.
-SECRET_KEY = os.getenv("DJANGO_SECRET_KEY")
+SECRET_KEY = _env.get("DJANGO_SECRET_KEY")
 if not SECRET_KEY:
     raise ValueError(
         "La variable de entorno DJANGO_SECRET_KEY debe estar definida."
     )
 
-DEBUG = os.getenv("DJANGO_DEBUG", "0") == "1"
-ALLOWED_HOSTS = os.getenv(
-    "DJANGO_ALLOWED_HOSTS", 
+DEBUG = _env.get("DJANGO_DEBUG", "0") == "1"
+ALLOWED_HOSTS = _env.get(
+    "DJANGO_ALLOWED_HOSTS",
     "127.0.0.1,localhost"
     ).split(",")
 
@@ -98,13 +108,29 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Define límites de carga de archivos (25MB por defecto).
-MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "25"))
+MAX_UPLOAD_MB = _env_int("MAX_UPLOAD_MB", 25)
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_MB * 1024 * 1024
-FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_MB * 1024 * 1024
+
+# Cargas mayores a este umbral (2.5MB por defecto, el de Django) se
+# escriben por bloques a un archivo temporal y se procesan desde disco.
+FILE_UPLOAD_MAX_MEMORY_SIZE = _env_int(
+    "FILE_UPLOAD_MAX_MEMORY_SIZE",
+    2621440,
+)
 
 # Configura parámetros del modelo.
-CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-5-20250929")
-MAX_TOKENS = int(os.getenv("MAX_TOKENS", "20000"))
+CLAUDE_MODEL = _env.get("CLAUDE_MODEL", "claude-sonnet-4-5-20250929")
+MAX_TOKENS = _env_int("MAX_TOKENS", 20000)
+
+# Reintento de reparación: solo reformatea la salida previa, así que usa
+# un modelo más rápido y un tope de tokens menor (vacío = CLAUDE_MODEL).
+CLAUDE_MODEL_REPAIR = _env.get("CLAUDE_MODEL_REPAIR", "claude-haiku-4-5-20251001")
+MAX_TOKENS_REPAIR = _env_int("MAX_TOKENS_REPAIR", 2048)
+
+# Define cuántas llamadas al modelo corren en paralelo por documento. El
+# primer bloque se envía solo para que escriba la caché del prompt y los
+# demás la lean; con documentos de pocos bloques eso cuesta una ronda.
+TCGEN_LLM_CONCURRENCY = _env_int("TCGEN_LLM_CONCURRENCY", 4)
 
 # Define rutas de archivos del proyecto.
 PROMPT_FILE = BASE_DIR / "prompt" / "prompt.txt"
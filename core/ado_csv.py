@@ -12,15 +12,19 @@ Responsabilidades:
 """
 from __future__ import annotations
 
+import codecs
 import csv
 import io
 import re
-from typing import Final
+from typing import Final, Iterable, Iterator
 
 # Constantes de formato CSV
 BOM: Final[str] = "\ufeff"
+# BOM en bytes para descargas compatibles con Excel
+CSV_EXCEL_BOM: Final[bytes] = codecs.BOM_UTF8
 CSV_DELIMITER: Final[str] = ","
 CSV_QUOTECHAR: Final[str] = '"'
+CSV_DIALECT: Final[str] = "ado"
 DEFAULT_STATE: Final[str] = "Design"
 
 # Definicion de columnas de Azure DevOps
@@ -45,6 +49,7 @@ ADO_COLUMNS: Final[list[str]] = [
 # Constantes derivadas
 ADO_NCOLS: Final[int] = len(ADO_COLUMNS)
 ADO_CSV_HEADER: Final[str] = CSV_DELIMITER.join(ADO_COLUMNS)
+_ADO_CSV_HEADER_NOSPACE: Final[str] = ADO_CSV_HEADER.replace(" ", "")
 
 # Marcadores especiales
 LIMIT_REACHED_MARK: Final[str] = "(Limit reached)"
@@ -60,6 +65,26 @@ TYPE_TEST_ALIASES: Final[frozenset[str]] = frozenset(
 )
 PRIORITY_ALLOWED: Final[frozenset[str]] = frozenset({"1", "2", "3"})
 
+# Dialecto de escritura registrado una sola vez al importar el modulo
+csv.register_dialect(
+    CSV_DIALECT,
+    delimiter=CSV_DELIMITER,
+    quotechar=CSV_QUOTECHAR,
+    quoting=csv.QUOTE_MINIMAL,
+    lineterminator="\n",
+)
+
+# Patrones precompilados (se reutilizan por cada fila procesada)
+_RE_NEWLINES: Final[re.Pattern[str]] = re.compile(r"\n+")
+_RE_MULTISPACE: Final[re.Pattern[str]] = re.compile(r"\s{2,}")
+
+# "\r" -> "\n" en una sola pasada; "\r\n" queda como "\n\n" y se colapsa
+# despues con _RE_NEWLINES.
+_CR_TRANS: Final[dict[int, str]] = str.maketrans({"\r": "\n"})
+
+# Variantes de bullet que se normalizan a "•"
+_BULLET_TRANS: Final[dict[int, str]] = str.maketrans({"·": "•", "◦": "•"})
+
 
 def _one_line_with_bullets(text: str) -> str:
     """
@@ -71,11 +96,11 @@ def _one_line_with_bullets(text: str) -> str:
     Returns:
         Texto en una sola linea con bullets como separadores
     """
-    s = (text or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+    s = (text or "").translate(_CR_TRANS).strip()
     if not s:
         return ""
-    s = re.sub(r"\n+", BULLET_SEP, s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
+    s = _RE_NEWLINES.sub(BULLET_SEP, s)
+    s = _RE_MULTISPACE.sub(" ", s).strip()
     return s
 
 
@@ -99,10 +124,10 @@ def _sanitize_omitted_objectives(text: str) -> str:
         return ""
 
     # Normaliza posibles variantes de bullet
-    s = s.replace("·", "•").replace("◦", "•")
+    s = s.translate(_BULLET_TRANS)
 
-    # Divide por bullets existentes
-    items = [x.strip() for x in re.split(r"\s*•\s*", s) if x.strip()]
+    # Divide por bullets existentes (separador literal, sin regex)
+    items = [p for p in (x.strip() for x in s.split("•")) if p]
     if not items:
         return ""
 
@@ -128,12 +153,12 @@ def ensure_csv_header(csv_body: str) -> str:
     if not body:
         return ADO_CSV_HEADER
 
-    first_line = body.splitlines()[0].strip()
+    # Solo se necesita la primera linea; no se materializan las demas
+    first_line = body.split("\n", 1)[0].strip()
 
     # Tolerancia a espacios accidentales despues de comas
     normalized_first = first_line.replace(" ", "")
-    normalized_header = ADO_CSV_HEADER.replace(" ", "")
-    if normalized_first == normalized_header:
+    if normalized_first == _ADO_CSV_HEADER_NOSPACE:
         return body
 
     return f"{ADO_CSV_HEADER}\n{body}"
@@ -177,56 +202,116 @@ def _ensure_ncols(row: list[str]) -> list[str]:
     Raises:
         ValueError: Si la fila tiene columnas extra con contenido
     """
-    cleaned = [(cell or "").strip() for cell in row]
+    # Caso comun (parseo bien formado): longitud exacta
+    if len(row) == ADO_NCOLS:
+        return [cell.strip() if cell else "" for cell in row]
+
+    cleaned = [cell.strip() if cell else "" for cell in row]
 
     if len(cleaned) > ADO_NCOLS:
         extras = cleaned[ADO_NCOLS:]
-        if all(x == "" for x in extras):
-            cleaned = cleaned[:ADO_NCOLS]
-        else:
-            raise ValueError(
-                f"Fila CSV invalida: se esperaban {ADO_NCOLS} columnas, "
-                f"se recibieron {len(cleaned)}. "
-                f"Extra(s) con contenido={extras!r}. Fila={cleaned!r}"
-            )
-
-    if len(cleaned) < ADO_NCOLS:
-        cleaned.extend([""] * (ADO_NCOLS - len(cleaned)))
+        if any(extras):
+            _raise_extra_columns(cleaned, extras)
+        return cleaned[:ADO_NCOLS]
 
+    cleaned.extend([""] * (ADO_NCOLS - len(cleaned)))
     return cleaned
 
 
-def parse_ado_rows(csv_text: str) -> list[list[str]]:
+def _raise_extra_columns(cleaned: list[str], extras: list[str]) -> None:
     """
-    Parsea texto CSV a filas ADO (sin encabezado).
+    Levanta el error de columnas extra con contenido (ruta poco frecuente).
+
+    Args:
+        cleaned: Fila completa ya normalizada
+        extras: Columnas sobrantes despues de ADO_NCOLS
+
+    Raises:
+        ValueError: Siempre
+    """
+    raise ValueError(
+        f"Fila CSV invalida: se esperaban {ADO_NCOLS} columnas, "
+        f"se recibieron {len(cleaned)}. "
+        f"Extra(s) con contenido={extras!r}. Fila={cleaned!r}"
+    )
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """
+    Itera las lineas de un texto conservando el salto de linea final.
+
+    Equivale a iterar io.StringIO(text) pero sin copiar el texto completo
+    a un buffer intermedio. Conservar "\n" es necesario para que csv.reader
+    preserve los saltos de linea dentro de celdas entre comillas.
+
+    Args:
+        text: Texto a recorrer
+
+    Yields:
+        Cada linea del texto, incluyendo su "\n" si lo tiene
+    """
+    start = 0
+    size = len(text)
+    while start < size:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start : end + 1]
+        start = end + 1
+
+
+def _iter_ado_rows(csv_text: str) -> Iterator[list[str]]:
+    """
+    Recorre el texto CSV entregando filas ADO (sin encabezado) una a una.
 
     Omite filas vacias y omite la fila de encabezado si viene incluida.
 
     Args:
         csv_text: Texto en formato CSV
 
-    Returns:
-        Lista de filas parseadas y normalizadas
+    Yields:
+        Filas parseadas y normalizadas
+
+    Raises:
+        ValueError: Si alguna fila tiene columnas extra con contenido
     """
-    txt = (csv_text or "").lstrip(BOM).strip()
+    txt = csv_text or ""
+    if txt.startswith(BOM):
+        txt = txt.lstrip(BOM)
+    # strip() retorna el mismo objeto si no hay nada que recortar (caso
+    # comun: los llamadores ya entregan el texto recortado), sin copia.
+    txt = txt.strip()
     if not txt:
-        return []
+        return
 
     reader = csv.reader(
-        io.StringIO(txt),
+        _iter_lines(txt),
         delimiter=CSV_DELIMITER,
         quotechar=CSV_QUOTECHAR,
     )
 
-    rows: list[list[str]] = []
     for row in reader:
         if not row:
             continue
         if is_header_row(row):
             continue
-        rows.append(_ensure_ncols(row))
+        yield _ensure_ncols(row)
+
 
-    return rows
+def parse_ado_rows(csv_text: str) -> list[list[str]]:
+    """
+    Parsea texto CSV a filas ADO (sin encabezado).
+
+    Omite filas vacias y omite la fila de encabezado si viene incluida.
+
+    Args:
+        csv_text: Texto en formato CSV
+
+    Returns:
+        Lista de filas parseadas y normalizadas
+    """
+    return list(_iter_ado_rows(csv_text))
 
 
 def dump_ado_rows(rows: list[list[str]]) -> str:
@@ -244,23 +329,19 @@ def dump_ado_rows(rows: list[list[str]]) -> str:
     Raises:
         ValueError: Si alguna fila no tiene el numero correcto de columnas
     """
-    buf = io.StringIO()
-    writer = csv.writer(
-        buf,
-        delimiter=CSV_DELIMITER,
-        quotechar=CSV_QUOTECHAR,
-        quoting=csv.QUOTE_MINIMAL,
-        lineterminator="\n",
-    )
-
     for row in rows:
         if len(row) != ADO_NCOLS:
             raise ValueError(
                 f"Fila interna invalida: se esperaban {ADO_NCOLS} columnas."
             )
-        writer.writerow(row)
 
-    return buf.getvalue().strip()
+    buf = io.StringIO()
+    writer = csv.writer(buf, dialect=CSV_DIALECT)
+    writer.writerows(rows)
+
+    # Las celdas ya vienen sin espacios al inicio; basta recortar el
+    # salto de linea final.
+    return buf.getvalue().rstrip("\n")
 
 
 def is_tc_start(row: list[str]) -> bool:
@@ -279,10 +360,18 @@ def is_tc_start(row: list[str]) -> bool:
     Returns:
         True si es inicio de Test Case, False en caso contrario
     """
-    work_item = (row[1] or "").strip().lower()
-    title = (row[2] or "").strip()
-    test_step = (row[3] or "").strip()
-    return work_item == "test case" or (bool(title) and not test_step)
+    # Se evalua primero lo mas barato: las filas de paso suelen traer
+    # Work Item Type y Title vacios, por lo que se evita hacer strip().
+    work_item = row[1]
+    if work_item and work_item.strip().lower() == "test case":
+        return True
+
+    title = row[2]
+    if not (title and title.strip()):
+        return False
+
+    test_step = row[3]
+    return not (test_step and test_step.strip())
 
 
 def _sanitize_preconditions(text: str) -> str:
@@ -295,16 +384,44 @@ def _sanitize_preconditions(text: str) -> str:
     Returns:
         Texto en una sola linea con bullets como separadores
     """
-    s = (text or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+    s = (text or "").translate(_CR_TRANS).strip()
     if not s:
         return ""
-    s = re.sub(r"\n+", BULLET_SEP, s)
-    s = re.sub(r"\s{2,}", " ", s).strip()
+    s = _RE_NEWLINES.sub(BULLET_SEP, s)
+    s = _RE_MULTISPACE.sub(" ", s).strip()
     return s
 
 
-def enforce_structure_and_titles(
-    rows: list[list[str]],
+def _cell(row: list[str], idx: int) -> str:
+    """
+    Retorna la celda sin espacios; corto-circuita en celdas vacias (el
+    caso comun en filas de paso).
+    """
+    value = row[idx]
+    return value.strip() if value else ""
+
+
+# Columnas posteriores a Step Expected: siempre vacias en filas de paso
+_STEP_ROW_TAIL: Final[list[str]] = [""] * (ADO_NCOLS - 6)
+
+
+def _make_step_row(step_num: str, action: str, expected: str = "") -> list[str]:
+    """
+    Construye una fila de paso ADO (solo Test Step/Step action/expected).
+
+    Args:
+        step_num: Numero de paso ya formateado como string
+        action: Texto de Step action (ya sanitizado)
+        expected: Texto de Step Expected (ya sanitizado)
+
+    Returns:
+        Fila con exactamente ADO_NCOLS elementos
+    """
+    return ["", "", "", step_num, action, expected] + _STEP_ROW_TAIL
+
+
+def _iter_enforced_rows(
+    rows: Iterable[list[str]],
     *,
     project_id: str,
     requirement_number: int,
@@ -312,29 +429,18 @@ def enforce_structure_and_titles(
     state: str = DEFAULT_STATE,
     area_path: str | None = None,
     assigned_to: str = "",
-) -> tuple[list[list[str]], int]:
+    already_normalized: bool = False,
+) -> Iterator[list[str]]:
     """
-    Normaliza filas a una estructura ADO consistente.
+    Aplica las reglas de estructura ADO y entrega cada fila resultante a
+    medida que se produce (sin lista intermedia).
 
-    Reglas aplicadas:
-    - Fila metadata del TC: sin Test Step/Step action/Step Expected
-    - EXCEPCION: fila final Limit reached tiene Expected result especial
-    - Filas siguientes: pasos 1..N (solo Step action/expected)
-    - Fuerza State/Area Path/Assigned To en metadata
-    - Sanitiza Preconditions para que no rompa el CSV
-    - Repara corrimientos comunes de columnas en metadata (salidas del LLM)
+    Ver enforce_structure_and_titles para las reglas aplicadas. Las filas
+    metadata de TC (incluida la fila Limit reached) son las unicas que
+    salen con Work Item Type no vacio.
 
-    Args:
-        rows: Filas parseadas a normalizar
-        project_id: ID del proyecto
-        requirement_number: Numero de requerimiento
-        tc_start: Indice inicial de numeracion de TCs
-        state: Estado del Test Case (por defecto "Design")
-        area_path: Ruta de area en ADO
-        assigned_to: Usuario asignado
-
-    Returns:
-        Tupla con (filas_normalizadas, cantidad_de_test_cases)
+    Yields:
+        Filas normalizadas con exactamente ADO_NCOLS elementos
     """
     # Indices de columnas ADO
     IDX_ID = 0
@@ -347,10 +453,8 @@ def enforce_structure_and_titles(
     IDX_PRIORITY = 7
     IDX_EXPECTED_RESULT = 8
     IDX_OBJETIVE = 9
-    IDX_OPER_SCENARIO = 10
     IDX_PRECONDITIONS = 11
     IDX_STATE = 12
-    IDX_AREA = 13
     IDX_ASSIGNED = 14
 
     def _count_omitted_objectives(obj_text: str) -> int:
@@ -362,18 +466,16 @@ def enforce_structure_and_titles(
         s = (obj_text or "").strip()
         if not s:
             return 0
-        s = s.replace("·", "•").replace("◦", "•")
-        items = [x.strip() for x in re.split(r"\s*•\s*", s) if x.strip()]
+        s = s.translate(_BULLET_TRANS)
+        items = [p for p in (x.strip() for x in s.split("•")) if p]
         if len(items) < 2:
             return 0
         if not any(x.lower().startswith("que el bot") for x in items):
             return 0
         return len(items)
 
-    out: list[list[str]] = []
     tc_idx = tc_start - 1
     step_idx = 0
-    tcs_count = 0
 
     has_open_tc = False
     limit_emitted = False
@@ -381,9 +483,14 @@ def enforce_structure_and_titles(
     forced_state = (state or DEFAULT_STATE).strip() or DEFAULT_STATE
     forced_area = (area_path or project_id or "").strip()
     forced_assigned = (assigned_to or "").strip()
+    forced_meta_tail = (forced_state, forced_area, forced_assigned)
+
+    # El prefijo del titulo es invariante durante toda la llamada.
+    title_prefix = f"{project_id}.{requirement_number:03d}."
 
     for row in rows:
-        row = _ensure_ncols(row)
+        if not already_normalized:
+            row = _ensure_ncols(row)
 
         # Si ya emitimos la fila final "Limit reached", ignoramos todo
         # lo que venga despues.
@@ -392,33 +499,29 @@ def enforce_structure_and_titles(
 
         if is_tc_start(row):
             tc_idx += 1
-            tcs_count += 1
             has_open_tc = True
             step_idx = 0
 
-            first_step_action = (row[IDX_STEP_ACTION] or "").strip()
-            first_step_expected = (row[IDX_STEP_EXPECTED] or "").strip()
-            expected_result = (row[IDX_EXPECTED_RESULT] or "").strip()
+            first_step_action = _cell(row, IDX_STEP_ACTION)
+            first_step_expected = _cell(row, IDX_STEP_EXPECTED)
+            expected_result = _cell(row, IDX_EXPECTED_RESULT)
 
             # Detecta limit row por marcador explicito.
-            is_limit_marker = any(
-                first_step_action.startswith(m)
-                for m in LIMIT_REACHED_MARKERS
-            ) or any(
-                expected_result.startswith(m)
-                for m in LIMIT_REACHED_MARKERS
+            is_limit_marker = first_step_action.startswith(
+                LIMIT_REACHED_MARKERS
+            ) or expected_result.startswith(LIMIT_REACHED_MARKERS)
+
+            # La heuristica de bullets solo aplica desde el TC 11 y si no
+            # hay marcador explicito (caso comun: no se evalua).
+            is_limit_row = is_limit_marker or (
+                tc_idx >= 11
+                and _count_omitted_objectives(row[IDX_OBJETIVE]) > 0
             )
 
-            omitted_count = _count_omitted_objectives(row[IDX_OBJETIVE])
-            is_limit_like = tc_idx >= 11 and omitted_count > 0
-
-            is_limit_row = is_limit_marker or is_limit_like
-
             # Metadata base
             row[IDX_ID] = ""
             row[IDX_WORK_ITEM] = "Test Case"
-            title = f"{project_id}.{requirement_number:03d}.{tc_idx:03d}"
-            row[IDX_TITLE] = title
+            row[IDX_TITLE] = f"{title_prefix}{tc_idx:03d}"
             row[IDX_TEST_STEP] = ""
 
             # Sanitiza Preconditions (una sola linea)
@@ -429,47 +532,57 @@ def enforce_structure_and_titles(
             #
             # Caso observado: el LLM duplica "Functional" en Priority y desplaza:
             # Priority(1/2/3) -> Expected result -> Objetive -> Operating Scenario
-            prio_raw = (row[IDX_PRIORITY] or "").strip().lower()
-            expected_maybe_priority = (row[IDX_EXPECTED_RESULT] or "").strip()
-            objetive_maybe_expected = (row[IDX_OBJETIVE] or "").strip()
-            scenario_maybe_objetive = (row[IDX_OPER_SCENARIO] or "").strip()
-            precond_maybe_scenario = (row[IDX_PRECONDITIONS] or "").strip()
-
-            is_shift_pattern = (
-                prio_raw in TYPE_TEST_ALIASES
-                and expected_maybe_priority in PRIORITY_ALLOWED
-                and bool(objetive_maybe_expected)
-                and scenario_maybe_objetive.lower().startswith("que el bot")
-            )
-
-            if is_shift_pattern:
-                row[IDX_PRIORITY] = expected_maybe_priority
-                row[IDX_EXPECTED_RESULT] = objetive_maybe_expected
-                row[IDX_OBJETIVE] = scenario_maybe_objetive
-                row[IDX_OPER_SCENARIO] = precond_maybe_scenario
-                row[IDX_PRECONDITIONS] = ""
+            #
+            # Caso comun: Priority no trae un tipo de prueba y no hace falta
+            # leer el resto de las celdas.
+            prio_cell = row[IDX_PRIORITY]
+            if prio_cell and prio_cell.strip().lower() in TYPE_TEST_ALIASES:
+                # Una sola pasada sobre Priority..Preconditions (5 celdas).
+                (
+                    _,
+                    expected_maybe_priority,
+                    objetive_maybe_expected,
+                    scenario_maybe_objetive,
+                    precond_maybe_scenario,
+                ) = [
+                    c.strip() if c else ""
+                    for c in row[IDX_PRIORITY : IDX_PRECONDITIONS + 1]
+                ]
+
+                # Solo se pasan a minusculas los caracteres que se comparan.
+                is_shift_pattern = (
+                    expected_maybe_priority in PRIORITY_ALLOWED
+                    and bool(objetive_maybe_expected)
+                    and scenario_maybe_objetive[:10].lower() == "que el bot"
+                )
+
+                if is_shift_pattern:
+                    row[IDX_PRIORITY : IDX_PRECONDITIONS + 1] = (
+                        expected_maybe_priority,
+                        objetive_maybe_expected,
+                        scenario_maybe_objetive,
+                        precond_maybe_scenario,
+                        "",
+                    )
 
             # Default tipo de prueba si viene vacio
-            if not (row[IDX_TYPE_TEST] or "").strip():
+            if not _cell(row, IDX_TYPE_TEST):
                 row[IDX_TYPE_TEST] = "Functional"
 
             # En metadata, Priority debe ser numerico.
-            prio_final = (row[IDX_PRIORITY] or "").strip()
+            prio_final = _cell(row, IDX_PRIORITY)
             if prio_final and prio_final not in PRIORITY_ALLOWED:
                 row[IDX_PRIORITY] = "1"
 
             # Fuerza State/Area/Assigned en metadata
-            row[IDX_STATE] = forced_state
-            row[IDX_AREA] = forced_area
-            row[IDX_ASSIGNED] = forced_assigned
+            row[IDX_STATE : IDX_ASSIGNED + 1] = forced_meta_tail
 
             if is_limit_row:
                 # Fila FINAL Limit reached: una sola fila, sin pasos.
                 row[IDX_TEST_STEP] = ""
 
                 # Limpia columnas de pasos (por consistencia).
-                row[IDX_STEP_ACTION] = ""
-                row[IDX_STEP_EXPECTED] = ""
+                row[IDX_STEP_ACTION : IDX_STEP_EXPECTED + 1] = ("", "")
 
                 # Marca ahora en Expected result (columna correcta).
                 row[IDX_EXPECTED_RESULT] = LIMIT_REACHED_MARK
@@ -478,7 +591,7 @@ def enforce_structure_and_titles(
                 objetive_text = row[IDX_OBJETIVE]
                 row[IDX_OBJETIVE] = _sanitize_omitted_objectives(objetive_text)
 
-                out.append(row)
+                yield row
 
                 limit_emitted = True
                 has_open_tc = False
@@ -486,21 +599,17 @@ def enforce_structure_and_titles(
                 continue
 
             # TC normal: metadata NO lleva pasos.
-            row[IDX_STEP_ACTION] = ""
-            row[IDX_STEP_EXPECTED] = ""
-            out.append(row)
+            row[IDX_STEP_ACTION : IDX_STEP_EXPECTED + 1] = ("", "")
+            yield row
 
             # Si el modelo metio Step action en metadata, lo movemos a Step 1.
             if first_step_action:
                 step_idx = 1
-                step_row = [""] * ADO_NCOLS
-                step_row[IDX_TEST_STEP] = "1"
                 action_text = _one_line_with_bullets(first_step_action)
-                step_row[IDX_STEP_ACTION] = action_text
+                expected_text = ""
                 if first_step_expected:
                     expected_text = _one_line_with_bullets(first_step_expected)
-                    step_row[IDX_STEP_EXPECTED] = expected_text
-                out.append(step_row)
+                yield _make_step_row("1", action_text, expected_text)
 
             continue
 
@@ -508,20 +617,126 @@ def enforce_structure_and_titles(
         if not has_open_tc:
             continue
 
-        step_action = (row[IDX_STEP_ACTION] or "").strip()
-        step_expected = (row[IDX_STEP_EXPECTED] or "").strip()
+        step_action = _cell(row, IDX_STEP_ACTION)
+        step_expected = _cell(row, IDX_STEP_EXPECTED)
 
         if not step_action:
             continue
 
         step_idx += 1
-        step_row = [""] * ADO_NCOLS
-        step_row[IDX_TEST_STEP] = str(step_idx)
-        step_row[IDX_STEP_ACTION] = _one_line_with_bullets(step_action)
+        action_text = _one_line_with_bullets(step_action)
+        expected_text = ""
         if step_expected:
             expected_text = _one_line_with_bullets(step_expected)
-            step_row[IDX_STEP_EXPECTED] = expected_text
 
-        out.append(step_row)
+        yield _make_step_row(str(step_idx), action_text, expected_text)
+
+
+def enforce_structure_and_titles(
+    rows: list[list[str]],
+    *,
+    project_id: str,
+    requirement_number: int,
+    tc_start: int,
+    state: str = DEFAULT_STATE,
+    area_path: str | None = None,
+    assigned_to: str = "",
+    already_normalized: bool = False,
+) -> tuple[list[list[str]], int]:
+    """
+    Normaliza filas a una estructura ADO consistente.
+
+    Reglas aplicadas:
+    - Fila metadata del TC: sin Test Step/Step action/Step Expected
+    - EXCEPCION: fila final Limit reached tiene Expected result especial
+    - Filas siguientes: pasos 1..N (solo Step action/expected)
+    - Fuerza State/Area Path/Assigned To en metadata
+    - Sanitiza Preconditions para que no rompa el CSV
+    - Repara corrimientos comunes de columnas en metadata (salidas del LLM)
+
+    Args:
+        rows: Filas parseadas a normalizar
+        project_id: ID del proyecto
+        requirement_number: Numero de requerimiento
+        tc_start: Indice inicial de numeracion de TCs
+        state: Estado del Test Case (por defecto "Design")
+        area_path: Ruta de area en ADO
+        assigned_to: Usuario asignado
+        already_normalized: True si las filas ya pasaron por
+            parse_ado_rows (se omite re-normalizarlas y se modifican
+            en sitio)
+
+    Returns:
+        Tupla con (filas_normalizadas, cantidad_de_test_cases)
+    """
+    out: list[list[str]] = []
+    tcs_count = 0
+    for row in _iter_enforced_rows(
+        rows,
+        project_id=project_id,
+        requirement_number=requirement_number,
+        tc_start=tc_start,
+        state=state,
+        area_path=area_path,
+        assigned_to=assigned_to,
+        already_normalized=already_normalized,
+    ):
+        if row[1]:
+            tcs_count += 1
+        out.append(row)
 
     return out, tcs_count
+
+
+def enforce_structure_and_titles_text(
+    csv_text: str,
+    *,
+    project_id: str,
+    requirement_number: int,
+    tc_start: int,
+    state: str = DEFAULT_STATE,
+    area_path: str | None = None,
+    assigned_to: str = "",
+) -> tuple[str, int]:
+    """
+    Equivale a parse_ado_rows + enforce_structure_and_titles +
+    dump_ado_rows en una sola pasada sobre el texto.
+
+    Cada fila se parsea, normaliza y escribe al buffer de salida sin
+    materializar listas intermedias de filas. La validacion de columnas
+    es la misma de parse_ado_rows: se recorren todas las filas, incluso
+    las posteriores a la fila Limit reached.
+
+    Args:
+        csv_text: Texto CSV crudo (sin encabezado o con el)
+        project_id: ID del proyecto
+        requirement_number: Numero de requerimiento
+        tc_start: Indice inicial de numeracion de TCs
+        state: Estado del Test Case (por defecto "Design")
+        area_path: Ruta de area en ADO
+        assigned_to: Usuario asignado
+
+    Returns:
+        Tupla con (csv_normalizado, cantidad_de_test_cases)
+
+    Raises:
+        ValueError: Si alguna fila tiene columnas extra con contenido
+    """
+    buf = io.StringIO()
+    writerow = csv.writer(buf, dialect=CSV_DIALECT).writerow
+    tcs_count = 0
+    for row in _iter_enforced_rows(
+        _iter_ado_rows(csv_text),
+        project_id=project_id,
+        requirement_number=requirement_number,
+        tc_start=tc_start,
+        state=state,
+        area_path=area_path,
+        assigned_to=assigned_to,
+        already_normalized=True,
+    ):
+        if row[1]:
+            tcs_count += 1
+        writerow(row)
+
+    return buf.getvalue().rstrip("\n"), tcs_count
@@ -12,6 +12,7 @@ from __future__ import annotations
 
 import logging
 import os
+from functools import lru_cache
 from typing import Any, Final
 
 from anthropic import Anthropic
@@ -23,10 +24,15 @@ ENV_API_KEY: Final[str] = "ANTHROPIC_API_KEY"
 DEFAULT_TEMPERATURE: Final[int] = 0
 
 
+@lru_cache(maxsize=1)
 def get_client() -> Anthropic:
     """
     Crea un cliente de Anthropic usando la clave desde variables de entorno.
 
+    El cliente se reutiliza entre llamadas para conservar el pool de
+    conexiones HTTP (keep-alive / sesiones TLS). Si falta la clave no se
+    cachea nada y se vuelve a intentar en la siguiente llamada.
+
     Returns:
         Cliente de Anthropic configurado.
 
@@ -40,11 +46,17 @@ def get_client() -> Anthropic:
     return Anthropic(api_key=api_key)
 
 
+# Un proceso hijo (fork de workers WSGI) no debe heredar el pool de
+# conexiones del padre.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=get_client.cache_clear)
+
+
 def call_claude(
     *,
     client: Anthropic,
-    system_prompt: str,
-    user_text: str,
+    system_prompt: str | list[dict[str, Any]],
+    user_text: str | list[dict[str, Any]],
     model: str,
     max_tokens: int,
 ) -> tuple[str, dict[str, int]]:
@@ -54,11 +66,13 @@ def call_claude(
     Notas:
     - Se concatenan múltiples bloques de salida para evitar pérdida de contenido.
     - El diccionario de usage siempre retorna enteros (0 si no están disponibles).
+    - system_prompt y user_text aceptan texto plano o una lista de bloques
+      de contenido (p. ej. con cache_control para prompt caching).
 
     Args:
         client: Cliente de Anthropic configurado.
-        system_prompt: Prompt del sistema con instrucciones.
-        user_text: Texto de entrada del usuario.
+        system_prompt: Prompt del sistema con instrucciones (texto o bloques).
+        user_text: Entrada del usuario (texto o bloques).
         model: Identificador del modelo a usar.
         max_tokens: Límite máximo de tokens de salida.
 
@@ -93,9 +107,22 @@ def _join_text_blocks(content: Any) -> str:
 
     Esta función es tolerante a respuestas sin contenido o con estructura parcial.
     """
+    blocks = content or []
+    if not blocks:
+        return ""
+
+    # Caso comun: un solo bloque; se evita construir la lista y el join.
+    if len(blocks) == 1:
+        text = getattr(blocks[0], "text", None)
+        return text.strip() if text else ""
+
     parts: list[str] = []
-    for block in content or []:
-        text = getattr(block, "text", None)
+    for block in blocks:
+        # Bloques sin texto (p. ej. tool_use) no exponen el atributo.
+        try:
+            text = block.text
+        except AttributeError:
+            continue
         if text:
             parts.append(text)
 
@@ -106,15 +133,23 @@ def _extract_usage(msg_usage: Any) -> dict[str, int]:
     """
     Extrae métricas de tokens desde el objeto usage.
 
+    Con prompt caching, `input_tokens` solo cuenta la parte no cacheada;
+    se suman las lecturas y escrituras de caché para reportar el input
+    completo del prompt.
+
     Retorna 0 cuando no existen métricas.
     """
     usage: dict[str, int] = {"input_tokens": 0, "output_tokens": 0}
     if not msg_usage:
         return usage
 
-    input_tokens = getattr(msg_usage, "input_tokens", 0)
+    input_tokens = (
+        int(getattr(msg_usage, "input_tokens", 0) or 0)
+        + int(getattr(msg_usage, "cache_read_input_tokens", 0) or 0)
+        + int(getattr(msg_usage, "cache_creation_input_tokens", 0) or 0)
+    )
     output_tokens = getattr(msg_usage, "output_tokens", 0)
 
-    usage["input_tokens"] = int(input_tokens or 0)
+    usage["input_tokens"] = input_tokens
     usage["output_tokens"] = int(output_tokens or 0)
     return usage
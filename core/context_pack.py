@@ -16,41 +16,94 @@ Nota: No divide requerimientos ni genera CSV.
 from __future__ import annotations
 
 import re
+from bisect import bisect_right
 from collections import Counter
-from typing import Final
+from itertools import accumulate
+from typing import Final, Iterator
+
+# Patrones para detectar valores explicitos del documento TO-BE.
+#
+# Todos se combinan en un solo escaneo (_DOC_SCAN_RE). Cada alternativa va
+# dentro de un lookahead para que las coincidencias de distintos grupos
+# puedan traslaparse (ej. "Sistema: X Input: Y" produce ambos valores),
+# igual que cuando cada patron se recorria por separado.
+#
+# Los cuantificadores posesivos (*+, ++, {m,n}+) se usan solo donde ceder
+# caracteres nunca puede producir una coincidencia distinta; evitan que el
+# motor retroceda en vano ante un TO-BE patologico.
+_SYSTEM_PAT: Final[str] = r"\bSistema\s*+:\s*([^\n]+)"
+_INPUT_PAT: Final[str] = r"\bInput\s*+:\s*([^\n]+)"
+_OUTPUT_PAT: Final[str] = r"\bOutput\s*+:\s*([^\n]+)"
 
-# Patrones para detectar valores explicitos del documento TO-BE
-_SYSTEM_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)\bSistema\s*:\s*([^\n]+)"
+# Extrae nombres entre comillas tipograficas o comillas dobles
+# Nota: Las comillas tipograficas (" ") son parte del patron a buscar
+# en documentos, no del codigo
+_QUOTED_NAME_PAT: Final[str] = r'["""\']([^"""\'\n]{3,90}+)["""\']'
+
+# Caracteres de comilla que reconoce _QUOTED_NAME_PAT
+_QUOTE_CHARS: Final[tuple[str, ...]] = ('"', "'")
+
+_DOC_FIELDS_SCAN_PAT: Final[str] = (
+    r"(?i)"
+    rf"(?=(?P<system>{_SYSTEM_PAT}))"
+    rf"|(?=(?P<input>{_INPUT_PAT}))"
+    rf"|(?=(?P<output>{_OUTPUT_PAT}))"
 )
-_INPUT_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)\bInput\s*:\s*([^\n]+)"
+_DOC_SCAN_RE: Final[re.Pattern[str]] = re.compile(
+    _DOC_FIELDS_SCAN_PAT + rf"|(?=(?P<quoted>{_QUOTED_NAME_PAT}))"
 )
-_OUTPUT_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)\bOutput\s*:\s*([^\n]+)"
+
+# Variante sin nombres entre comillas para documentos sin comillas
+_DOC_FIELDS_SCAN_RE: Final[re.Pattern[str]] = re.compile(
+    _DOC_FIELDS_SCAN_PAT
 )
-_NOTE_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)^\s*Nota(?:\s*\d+)?\s*:\s*(.+)$"
+
+# Patrones evaluados por linea (ya recortada/dividida). Se aplican sobre las
+# lineas unidas con "\n", por lo que los espacios se limitan a [^\S\n] para
+# no cruzar de una linea a otra.
+_NOTE_PAT: Final[str] = r"^Nota(?:[^\S\n]*\d++)?[^\S\n]*+:[^\S\n]*(.+)$"
+_ACTIVITY_REF_PAT: Final[str] = (
+    r"\b(?:obtenid[ao]s?[^\S\n]+en[^\S\n]+la[^\S\n]+actividad|actividad)"
+    r"[^\S\n]++\d++\b"
 )
-_ACTIVITY_REF_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)\b(?:obtenid[ao]s?\s+en\s+la\s+actividad|actividad)\s+\d+\b"
+
+# Detecta formatos/herramientas comunes de forma determinista.
+#
+# Se evalua sin IGNORECASE sobre el texto ya plegado a minusculas
+# (_HINT_FOLD + lower()), lo que permite al motor buscar los literales
+# directamente. ".csv" empieza con un punto, por lo que no lleva \b al
+# inicio (ej. "reporte .csv" tambien cuenta).
+_FORMAT_HINT_PAT: Final[str] = (
+    r"\b(?:"
+    r"dd/mm/(?:yyyy|aaaa)|hh:mi|yyyymmddhhmmss|ansi|"
+    r"sharepoint|outlook|geovictoria|turnex"
+    r")\b"
+    r"|\.csv\b"
+)
+_FORMAT_HINT_RE: Final[re.Pattern[str]] = re.compile(_FORMAT_HINT_PAT)
+
+# re con IGNORECASE equipara estos caracteres a letras ASCII; se pliegan
+# antes de lower() para que los patrones en minusculas vean lo mismo que
+# una regex con IGNORECASE. Ademas "\u0130".lower() produce dos
+# caracteres, lo que desplazaria las posiciones.
+_HINT_FOLD: Final[dict[int, str]] = str.maketrans(
+    {"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"}
 )
 
-# Extrae nombres entre comillas tipograficas o comillas dobles
-# Nota: Las comillas tipograficas (" ") son parte del patron a buscar
-# en documentos, no del codigo
-_QUOTED_NAME_RE: Final[re.Pattern[str]] = re.compile(
-    r'["""\']([^"""\'\n]{3,90})["""\']'
+_LINE_SCAN_RE: Final[re.Pattern[str]] = re.compile(
+    r"(?im)"
+    rf"(?=(?P<note>{_NOTE_PAT}))"
+    rf"|(?=(?P<activity>{_ACTIVITY_REF_PAT}))"
 )
 
-# Detecta formatos/herramientas comunes de forma determinista
-_FORMAT_HINT_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)\b("
-    r"DD/MM/YYYY|DD/MM/AAAA|HH:MI|YYYYMMDDhhmmss|ANSI|"
-    r"\.csv|SharePoint|Outlook|GeoVictoria|Turnex"
-    r")\b"
+# Segmentos entre saltos de linea; mismos separadores que str.splitlines()
+_LINE_SEGMENT_RE: Final[re.Pattern[str]] = re.compile(
+    r"[^\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]+"
 )
 
+# Limites de oracion para dividir lineas largas (conserva el separador)
+_SENTENCE_SPLIT_RE: Final[re.Pattern[str]] = re.compile(r"(\.\s+)")
+
 # Constantes de limites
 DEFAULT_MAX_CHARS: Final[int] = 2400
 DEFAULT_MAX_LINES: Final[int] = 80
@@ -86,20 +139,20 @@ def _split_long_line(
     se hace un corte duro por longitud.
 
     Args:
-        line: Linea de texto a dividir
+        line: Linea de texto a dividir, ya recortada (sin espacios en
+            los extremos)
         max_len: Longitud maxima permitida por segmento
 
     Returns:
         Lista de segmentos de texto
     """
-    cleaned = (line or "").strip()
-    if len(cleaned) <= max_len:
-        return [cleaned] if cleaned else []
+    if len(line) <= max_len:
+        return [line] if line else []
 
     parts: list[str] = []
     buffer_text = ""
 
-    for chunk in re.split(r"(\.\s+)", cleaned):
+    for chunk in _SENTENCE_SPLIT_RE.split(line):
         if not chunk:
             continue
 
@@ -128,23 +181,111 @@ def _split_long_line(
     return [item for item in out if item]
 
 
-def _collect_matches(pattern: re.Pattern[str], text: str) -> list[str]:
+def _iter_context_lines(text: str) -> Iterator[str]:
     """
-    Extrae coincidencias del grupo 1 de un patron regex.
+    Recorre las lineas recortadas y no vacias del texto, dividiendo las
+    muy largas, sin materializar listas intermedias.
 
     Args:
-        pattern: Patron de expresion regular
-        text: Texto donde buscar
+        text: Texto normalizado del TO-BE
+
+    Yields:
+        Lineas (o segmentos de lineas largas) en orden de aparicion
+    """
+    for match in _LINE_SEGMENT_RE.finditer(text):
+        ln = match.group().strip()
+        if not ln:
+            continue
+        # Las lineas cortas (la mayoria) pasan sin dividir
+        if len(ln) <= MAX_LONG_LINE_SPLIT:
+            yield ln
+        else:
+            yield from _split_long_line(ln)
+
+
+def _scan_document(text: str) -> dict[str, list[str]]:
+    """
+    Extrae sistemas, inputs, outputs y nombres entre comillas en un solo
+    recorrido del texto.
+
+    Dentro de un mismo grupo se respeta la semantica de finditer: una
+    coincidencia nueva solo cuenta si inicia despues de la anterior.
+
+    Args:
+        text: Texto normalizado del TO-BE
 
     Returns:
-        Lista de valores extraidos
+        Diccionario grupo -> valores encontrados (en orden de aparicion)
     """
-    items: list[str] = []
-    for match in pattern.finditer(text or ""):
-        value = (match.group(1) or "").strip()
+    found: dict[str, list[str]] = {
+        "system": [],
+        "input": [],
+        "output": [],
+        "quoted": [],
+    }
+    last_end: dict[str, int] = {}
+
+    # Si no hay comillas, no se buscan nombres entre comillas
+    has_quotes = any(quote in text for quote in _QUOTE_CHARS)
+    scan_re = _DOC_SCAN_RE if has_quotes else _DOC_FIELDS_SCAN_RE
+
+    for match in scan_re.finditer(text):
+        kind = match.lastgroup
+        if match.start() < last_end.get(kind, 0):
+            continue
+        last_end[kind] = match.end(kind)
+
+        value = (match.group(match.lastindex + 1) or "").strip()
         if value:
-            items.append(value)
-    return items
+            found[kind].append(value)
+
+    return found
+
+
+def _scan_lines(lines: list[str]) -> tuple[list[str], list[str], list[str]]:
+    """
+    Detecta notas y referencias a actividades en un solo recorrido sobre
+    las lineas unidas, y hints de formato en un segundo recorrido sobre
+    el mismo texto plegado a minusculas.
+
+    Args:
+        lines: Lineas recortadas y no vacias
+
+    Returns:
+        Tupla (textos_de_notas, lineas_con_referencias, lineas_con_formatos)
+    """
+    note_texts: list[str] = []
+    activity_refs: list[str] = []
+    format_hints: list[str] = []
+
+    # Offset de inicio de cada linea dentro del texto unido con "\n"
+    line_starts = list(
+        accumulate((len(ln) + 1 for ln in lines), initial=0)
+    )
+
+    joined = "\n".join(lines)
+    last_activity = -1
+    last_format = -1
+
+    for match in _LINE_SCAN_RE.finditer(joined):
+        if match.lastgroup == "note":
+            note_texts.append(match.group(match.lastindex + 1).strip())
+            continue
+
+        idx = bisect_right(line_starts, match.start()) - 1
+        if idx != last_activity:
+            activity_refs.append(lines[idx])
+            last_activity = idx
+
+    # Los formatos se buscan sobre el texto plegado (mismas posiciones)
+    folded = joined.translate(_HINT_FOLD).lower()
+    for match in _FORMAT_HINT_RE.finditer(folded):
+        idx = bisect_right(line_starts, match.start()) - 1
+        if idx != last_format:
+            format_hints.append(lines[idx])
+            last_format = idx
+
+    return note_texts, activity_refs, format_hints
 
 
 def _stable_unique(items: list[str]) -> list[str]:
@@ -157,7 +298,16 @@ def _stable_unique(items: list[str]) -> list[str]:
     Returns:
         Lista sin duplicados en orden original
     """
-    return list(dict.fromkeys(items))
+    if len(items) < 2:
+        return list(items)
+
+    seen: set[str] = set()
+    out: list[str] = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            out.append(item)
+    return out
 
 
 def build_context_pack(
@@ -180,50 +330,42 @@ def build_context_pack(
         max_lines: Limite de lineas del contexto generado
 
     Returns:
-        Texto del contexto global formateado
+        Texto del contexto global formateado (vacio si el TO-BE no tiene
+        contenido)
     """
-    normalized = _normalize(to_be_text)
-
-    # Extrae sistemas, inputs, outputs
-    systems = sorted(set(_collect_matches(_SYSTEM_RE, normalized)))
-    inputs = sorted(set(_collect_matches(_INPUT_RE, normalized)))
-    outputs = sorted(set(_collect_matches(_OUTPUT_RE, normalized)))
-
-    # Extrae nombres entre comillas
-    quoted = sorted(set(_collect_matches(_QUOTED_NAME_RE, normalized)))
+    if not to_be_text:
+        return ""
 
-    # Procesa lineas y divide las muy largas
-    raw_lines = [ln.strip() for ln in normalized.splitlines() if ln.strip()]
-    lines: list[str] = []
-    for ln in raw_lines:
-        lines.extend(_split_long_line(ln))
-
-    # Extrae notas y encuentra las repetidas
-    note_texts: list[str] = []
-    for ln in lines:
-        match = _NOTE_RE.match(ln)
-        if match:
-            note_texts.append(match.group(1).strip())
-
-    note_counts = Counter([note.lower() for note in note_texts])
+    normalized = _normalize(to_be_text)
+    if not normalized.strip():
+        return ""
+
+    # Extrae sistemas, inputs, outputs y nombres entre comillas
+    # (sin duplicados, en el orden en que aparecen en el documento)
+    found = _scan_document(normalized)
+    systems = _stable_unique(found["system"])
+    inputs = _stable_unique(found["input"])
+    outputs = _stable_unique(found["output"])
+    quoted = _stable_unique(found["quoted"])
+
+    # Procesa lineas y divide las muy largas (unica lista materializada)
+    lines = list(_iter_context_lines(normalized))
+
+    # Extrae notas, referencias a otras actividades y hints de formato
+    note_texts, activity_refs, format_hints = _scan_lines(lines)
+
+    # Encuentra las notas repetidas (cada nota se pasa a minusculas una
+    # sola vez) y elimina duplicados exactos en el mismo recorrido
+    note_keys = [note.lower() for note in note_texts]
+    note_counts = Counter(note_keys)
     repeated_notes: list[str] = []
-    for note in note_texts:
-        if note_counts.get(note.lower(), 0) >= 2:
+    seen_notes: set[str] = set()
+    for note, key in zip(note_texts, note_keys):
+        if note_counts[key] >= 2 and note not in seen_notes:
+            seen_notes.add(note)
             repeated_notes.append(note)
-    repeated_notes = _stable_unique(repeated_notes)
 
-    # Extrae referencias a otras actividades
-    activity_refs: list[str] = []
-    for ln in lines:
-        if _ACTIVITY_REF_RE.search(ln):
-            activity_refs.append(ln)
     activity_refs = _stable_unique(activity_refs)
-
-    # Extrae hints de formatos y herramientas
-    format_hints: list[str] = []
-    for ln in lines:
-        if _FORMAT_HINT_RE.search(ln):
-            format_hints.append(ln)
     format_hints = _stable_unique(format_hints)[:MAX_LOOKUP_FORMAT_LINES]
 
     # Construye el texto de salida
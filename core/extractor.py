@@ -12,7 +12,10 @@ Responsabilidades:
 """
 from __future__ import annotations
 
+import hashlib
 import io
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Final
 
@@ -21,7 +24,6 @@ from docx import Document
 from docx.oxml.table import CT_Tbl
 from docx.oxml.text.paragraph import CT_P
 from docx.table import Table
-from docx.text.paragraph import Paragraph
 
 # Constantes de tipos de archivo soportados
 SUPPORTED_EXTS: Final[tuple[str, ...]] = (".pdf", ".docx")
@@ -35,6 +37,28 @@ DOCX_EXT: Final[str] = ".docx"
 # mas confiable.
 TABLE_CELL_SEP: Final[str] = " "
 
+# Flags de extraccion de PyMuPDF: los de "text" sin preservar ligaduras,
+# asi MuPDF las expande (ej. "fi") y el texto queda listo para regex
+_PDF_TEXT_FLAGS: Final[int] = (
+    fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+)
+
+# Cache de texto extraido por (extension, SHA-256 del contenido); acotado
+# para no retener documentos grandes indefinidamente
+_TEXT_CACHE_MAX: Final[int] = 8
+_TEXT_CACHE: OrderedDict[tuple[str, str], str] = OrderedDict()
+_TEXT_CACHE_LOCK = threading.Lock()
+
+# Tabla de normalizacion para _clean_text (saltos de linea, caracteres
+# Unicode problematicos y guiones)
+_CLEAN_TABLE: Final[dict[int, str]] = str.maketrans({
+    "\r": "\n",
+    "\u200b": "",
+    "\xa0": " ",
+    "–": "-",
+    "—": "-",
+})
+
 
 def _clean_text(text: str) -> str:
     """
@@ -47,17 +71,13 @@ def _clean_text(text: str) -> str:
     Returns:
         Texto normalizado sin caracteres especiales problematicos
     """
-    if not text:
+    if not text or text.isspace():
         return ""
 
-    # Normaliza saltos de linea
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-
-    # Remueve caracteres especiales Unicode problematicos
-    text = text.replace("\u200b", "").replace("\xa0", " ")
-
-    # Normaliza guiones
-    text = text.replace("–", "-").replace("—", "-")
+    # Una sola pasada: saltos de linea, caracteres Unicode problematicos
+    # y guiones. "\r\n" queda como "\n\n"; la linea vacia extra se
+    # descarta abajo.
+    text = text.translate(_CLEAN_TABLE)
 
     # Limpia lineas vacias y normaliza espacios
     lines = [ln.strip() for ln in text.splitlines()]
@@ -68,31 +88,152 @@ def _iter_docx_blocks(doc: Document):
     """
     Itera bloques (parrafos y tablas) en el orden real del documento.
 
+    Los parrafos se entregan como elementos CT_P sin envolver: solo se
+    necesita su texto, que el elemento lxml ya expone (incluye tabs y
+    saltos de linea, igual que Paragraph.text).
+
     Args:
         doc: Documento DOCX cargado
 
     Yields:
-        Objetos Paragraph o Table en orden de aparicion
+        Elementos CT_P u objetos Table en orden de aparicion
     """
     body = doc.element.body
     for child in body.iterchildren():
         if isinstance(child, CT_P):
-            yield Paragraph(child, doc)
+            yield child
         elif isinstance(child, CT_Tbl):
             yield Table(child, doc)
 
 
-def extract_text_from_upload(filename: str, file_bytes: bytes) -> str:
+def _open_pdf(source: bytes | str) -> fitz.Document:
+    """
+    Abre un PDF desde memoria o desde una ruta en disco.
+
+    Con ruta, MuPDF lee el archivo bajo demanda y no hace falta tener
+    todo el contenido en memoria.
+
+    Args:
+        source: Contenido binario del PDF o ruta al archivo
+
+    Returns:
+        Documento PDF abierto
+    """
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _extract_pdf_text(source: bytes | str) -> str:
+    """
+    Extrae y normaliza el texto de un PDF preservando el orden de paginas.
+
+    Las paginas se acumulan en un solo buffer y se limpian una vez. La
+    extraccion es serial a proposito: PyMuPDF no admite hilos y un pool de
+    procesos por request cuesta mas (fork, arranque, pickling del PDF) de
+    lo que ahorra.
+
+    Args:
+        source: Contenido binario del PDF o ruta al archivo
+
+    Returns:
+        Texto extraido y normalizado
+    """
+    buf = io.StringIO()
+    with _open_pdf(source) as doc:
+        for page in doc:
+            page_text = page.get_text("text", flags=_PDF_TEXT_FLAGS)
+            if page_text:
+                buf.write(page_text)
+                buf.write("\n\n")
+    return _clean_text(buf.getvalue())
+
+
+def _extract_docx_text(source: bytes | str) -> str:
+    """
+    Extrae el texto de un DOCX respetando el orden real (parrafos y
+    tablas).
+
+    Args:
+        source: Contenido binario del DOCX o ruta al archivo
+
+    Returns:
+        Texto extraido y normalizado
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    doc = Document(source)
+    parts: list[str] = []
+
+    for block in _iter_docx_blocks(doc):
+        # Procesa parrafo
+        if isinstance(block, CT_P):
+            paragraph_text = _clean_text(block.text)
+            if paragraph_text:
+                parts.append(paragraph_text)
+            continue
+
+        # Procesa tabla
+        if isinstance(block, Table):
+            for row in block.rows:
+                cells: list[str] = []
+                for cell in row.cells:
+                    raw_text = cell.text
+                    if not raw_text:
+                        continue
+                    # Normaliza y une lineas multiples dentro de la
+                    # celda en una sola pasada (colapsa espacios)
+                    cell_text = " ".join(
+                        raw_text.translate(_CLEAN_TABLE).split()
+                    )
+                    if cell_text:
+                        cells.append(cell_text)
+
+                if cells:
+                    parts.append(TABLE_CELL_SEP.join(cells))
+
+    return "\n".join(parts).strip()
+
+
+def _content_digest(file_bytes: bytes, file_path: str | None) -> str:
+    """
+    Calcula el SHA-256 del documento; desde disco se lee por bloques.
+
+    Args:
+        file_bytes: Contenido binario del archivo
+        file_path: Ruta al archivo en disco (tiene prioridad)
+
+    Returns:
+        Digest hexadecimal del contenido
+    """
+    if file_path:
+        with open(file_path, "rb") as fh:
+            return hashlib.file_digest(fh, "sha256").hexdigest()
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def extract_text_from_upload(
+    filename: str,
+    file_bytes: bytes = b"",
+    *,
+    file_path: str | None = None,
+) -> str:
     """
     Extrae texto de PDF o DOCX.
 
     Reglas:
-    - PDF: se lee pagina por pagina preservando el orden
+    - PDF: se lee pagina por pagina preservando el orden y se limpia
+      el texto completo en una sola pasada
     - DOCX: se extrae respetando el orden real (parrafos y tablas)
+    - Si se indica file_path, el documento se lee desde disco y
+      file_bytes se ignora
+    - El resultado se cachea por contenido (SHA-256): un documento
+      repetido no se vuelve a extraer
 
     Args:
         filename: Nombre del archivo con extension
         file_bytes: Contenido binario del archivo
+        file_path: Ruta al archivo en disco (alternativa a file_bytes)
 
     Returns:
         Texto extraido y normalizado
@@ -101,48 +242,29 @@ def extract_text_from_upload(filename: str, file_bytes: bytes) -> str:
         ValueError: Si el tipo de archivo no esta soportado
     """
     ext = Path(filename).suffix.lower()
+    if ext not in SUPPORTED_EXTS:
+        raise ValueError(
+            f"Tipo de archivo no soportado. Permitidos: {SUPPORTED_EXTS}"
+        )
 
+    # Un documento identico (misma extension y contenido) reutiliza el
+    # texto ya extraido, p. ej. al regenerar con otro Assigned To
+    key = (ext, _content_digest(file_bytes, file_path))
+    with _TEXT_CACHE_LOCK:
+        cached = _TEXT_CACHE.get(key)
+        if cached is not None:
+            _TEXT_CACHE.move_to_end(key)
+            return cached
+
+    source = file_path or file_bytes
     if ext == PDF_EXT:
-        parts: list[str] = []
-        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-            for page in doc:
-                page_text = _clean_text(page.get_text("text") or "")
-                if page_text:
-                    parts.append(page_text)
-        return "\n\n".join(parts).strip()
-
-    if ext == DOCX_EXT:
-        doc = Document(io.BytesIO(file_bytes))
-        parts: list[str] = []
-
-        for block in _iter_docx_blocks(doc):
-            # Procesa parrafo
-            if isinstance(block, Paragraph):
-                paragraph_text = _clean_text(block.text)
-                if paragraph_text:
-                    parts.append(paragraph_text)
-                continue
-
-            # Procesa tabla
-            if isinstance(block, Table):
-                for row in block.rows:
-                    cells: list[str] = []
-                    for cell in row.cells:
-                        cell_text = _clean_text(cell.text)
-                        if not cell_text:
-                            continue
-                        # Une lineas multiples dentro de la celda
-                        cell_text = " ".join(
-                            cell_text.splitlines()
-                        ).strip()
-                        if cell_text:
-                            cells.append(cell_text)
-
-                    if cells:
-                        parts.append(TABLE_CELL_SEP.join(cells))
-
-        return "\n".join(parts).strip()
-
-    raise ValueError(
-        f"Tipo de archivo no soportado. Permitidos: {SUPPORTED_EXTS}"
-    )
+        text = _extract_pdf_text(source)
+    else:
+        text = _extract_docx_text(source)
+
+    with _TEXT_CACHE_LOCK:
+        _TEXT_CACHE[key] = text
+        while len(_TEXT_CACHE) > _TEXT_CACHE_MAX:
+            _TEXT_CACHE.popitem(last=False)
+
+    return text
@@ -17,6 +17,7 @@ from __future__ import annotations
 
 import csv
 import io
+from typing import Final
 
 from core.ado_csv import ADO_CSV_HEADER, ADO_NCOLS
 
@@ -24,22 +25,11 @@ from core.ado_csv import ADO_CSV_HEADER, ADO_NCOLS
 _BOM = "\ufeff"
 _CSV_DELIMITER = ","
 _CSV_QUOTECHAR = '"'
+_ID_LITERAL: Final[str] = "ID"
 
-
-def _normalize_header(header: str) -> str:
-    """
-    Normaliza un encabezado para comparaciones tolerando espacios.
-
-    Ejemplo:
-    - "ID, Work Item Type" vs "ID,Work Item Type"
-
-    Args:
-        header: Texto de encabezado a normalizar
-
-    Returns:
-        Encabezado sin espacios para comparacion
-    """
-    return (header or "").replace(" ", "").strip()
+# Header ADO normalizado para comparaciones tolerando espacios
+# (ej. "ID, Work Item Type" vs "ID,Work Item Type")
+_ADO_NORM_HEADER: Final[str] = ADO_CSV_HEADER.replace(" ", "").strip()
 
 
 def _strip_code_fences(text: str) -> str:
@@ -88,8 +78,44 @@ def _looks_like_ado_row(row: list[str]) -> bool:
     if len(row) != ADO_NCOLS:
         return False
 
-    first = (row[0] or "").strip()
-    return first == "" or first.upper() == "ID"
+    first = row[0]
+    if not first:
+        return True
+
+    first = first.strip()
+    return not first or first.upper() == _ID_LITERAL
+
+
+def _find_verbatim_header(cleaned: str) -> int:
+    """
+    Busca el header ADO literal (caso comun: el modelo lo copia tal cual)
+    con un solo str.find sobre el texto completo.
+
+    Solo acepta la posicion si el header ocupa una linea completa y no
+    hay antes otra linea que coincida ignorando espacios, de modo que el
+    resultado es el mismo que el de la busqueda linea por linea.
+
+    Args:
+        cleaned: Texto ya limpio de fences y BOM
+
+    Returns:
+        Posicion del header en cleaned, o -1 si se debe usar la busqueda
+        linea por linea
+    """
+    pos = cleaned.find(ADO_CSV_HEADER)
+    if pos == -1:
+        return -1
+
+    end = pos + len(ADO_CSV_HEADER)
+    starts_line = pos == 0 or cleaned[pos - 1] == "\n"
+    ends_line = end == len(cleaned) or cleaned[end] in "\r\n"
+    if not (starts_line and ends_line):
+        return -1
+
+    if pos and _ADO_NORM_HEADER in cleaned[:pos].replace(" ", ""):
+        return -1
+
+    return pos
 
 
 def extract_csv_only(text: str) -> str:
@@ -115,29 +141,43 @@ def extract_csv_only(text: str) -> str:
     if not cleaned:
         return ""
 
+    # Camino rapido: header literal encontrado con str.find
+    pos = _find_verbatim_header(cleaned)
+    if pos != -1:
+        return "\n".join(cleaned[pos:].splitlines()).strip()
+
     lines = cleaned.splitlines()
 
-    # Busca header ADO y recorta desde ahi
-    ado_norm = _normalize_header(ADO_CSV_HEADER)
+    # Busca header ADO (tolerando espacios) y recorta desde ahi
     for idx, line in enumerate(lines):
-        if _normalize_header(line) == ado_norm:
+        if line.replace(" ", "").strip() == _ADO_NORM_HEADER:
             return "\n".join(lines[idx:]).strip()
 
-    # Si no hay header, busca primera fila que parezca ADO
-    for idx in range(len(lines)):
-        chunk = "\n".join(lines[idx:]).strip()
-        if not chunk:
+    # Si no hay header, busca primera fila que parezca ADO.
+    # El texto se une una sola vez y se guarda el offset de cada linea;
+    # para cada candidata solo se parsea su primer registro desde ese
+    # offset, sin volver a unir ni copiar el resto del texto.
+    joined = "\n".join(lines)
+    buf = io.StringIO(joined)
+    line_start = 0
+    for line in lines:
+        offset = line_start
+        line_start += len(line) + 1
+
+        content = line.lstrip()
+        if not content:
             continue
 
+        buf.seek(offset + len(line) - len(content))
         try:
             reader = csv.reader(
-                io.StringIO(chunk),
+                buf,
                 delimiter=_CSV_DELIMITER,
                 quotechar=_CSV_QUOTECHAR,
             )
             first_row = next(reader, None)
             if first_row and _looks_like_ado_row(first_row):
-                return chunk
+                return joined[offset:].strip()
         except Exception:
             # Ignora errores de parseo y continua la busqueda
             continue
@@ -16,6 +16,7 @@ Responsabilidades:
 from __future__ import annotations
 
 import re
+import sys
 from dataclasses import dataclass
 from typing import Final
 
@@ -41,35 +42,64 @@ class RequirementBlock:
 # separadores " | ".
 # Ademas, algunos documentos concatenan "TO-BE2.4" (sin espacio),
 # por eso NO se usa \b.
+#
+# Estos patrones recorren el documento completo con (?m), donde ^\s*
+# puede abarcar muchas lineas en blanco. Los espacios usan cuantificadores
+# posesivos (*+, ++): el siguiente caracter nunca es espacio, asi que la
+# coincidencia es la misma pero el motor no retrocede sobre cada corrida
+# de espacios (evita costo cuadratico en PDFs con muchas lineas vacias).
+#
+# Cada patron cubre el encabezado numerado (2.4 / 2.5) y su variante sin
+# numero en una sola pasada: el grupo 1 solo participa cuando aparece el
+# numero, y se prefieren esas coincidencias.
 _TO_BE_START_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?mi)^\s*2\.4\s*(?:\|\s*)?"
-    r"Acciones\s+detalladas\s+del\s+proceso\s+TO[-\s]?BE.*$"
-)
-_TO_BE_START_FALLBACK_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?mi)^\s*(?:\|\s*)?"
-    r"Acciones\s+detalladas\s+del\s+proceso\s+TO[-\s]?BE.*$"
+    r"(?mi)^\s*+(2\.4\s*+)?(?:\|\s*+)?"
+    r"Acciones\s++detalladas\s++del\s++proceso\s++TO[-\s]?BE.*$"
 )
 
 _TO_BE_END_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?mi)^\s*2\.5\s*(?:\|\s*)?"
-    r"Matriz\s+(?:de\s+)?criterios\s+de\s+aceptaci[oó]n.*$"
-)
-_TO_BE_END_FALLBACK_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?mi)^\s*(?:\|\s*)?"
-    r"Matriz\s+(?:de\s+)?criterios\s+de\s+aceptaci[oó]n.*$"
+    r"(?mi)^\s*+(2\.5\s*+)?(?:\|\s*+)?"
+    r"Matriz\s++(?:de\s++)?criterios\s++de\s++aceptaci[oó]n.*$"
 )
 
 # Marcador de accion: soporta numeracion jerarquica (1.1.1.) y
 # separador "|".
 _ACTION_MARKER_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?mi)^\s*\d{1,3}(?:\.\d{1,3})*\.?\s*(?:\|\s*)?"
-    r"Nombre\s+de\s+la\s+acci[oó]n\b"
+    r"(?mi)^\s*+\d{1,3}(?:\.\d{1,3})*\.?\s*+(?:\|\s*+)?"
+    r"Nombre\s++de\s++la\s++acci[oó]n\b"
 )
 _TABLE_CELL_SEP: Final[str] = "|"
 
+# Tabla de _normalize: cada celda DOCX ("|") pasa a ser su propia linea
+# y se eliminan los espacios de ancho cero, en una sola pasada
+_NORMALIZE_TABLE: Final[dict[int, str | None]] = str.maketrans({
+    _TABLE_CELL_SEP: "\n",
+    "\u200b": None,
+})
+
 _LOOKAHEAD_CHARS: Final[int] = 80000
 
 
+def _prefer_numbered(
+    matches: list[re.Match[str]],
+) -> list[re.Match[str]]:
+    """
+    Filtra las coincidencias del encabezado TO-BE dejando las que traen
+    numero de seccion (grupo 1); si no hay ninguna, conserva todas.
+
+    Equivale a buscar primero con el patron numerado y solo si no hay
+    resultados con el alterno, pero con un solo recorrido del texto.
+
+    Args:
+        matches: Coincidencias de _TO_BE_START_RE
+
+    Returns:
+        Coincidencias preferidas, en orden de aparicion
+    """
+    numbered = [m for m in matches if m.group(1)]
+    return numbered or matches
+
+
 def slice_to_be_section(text: str) -> str:
     """
     Extrae la seccion 2.4 (acciones TO-BE) sin confundirse con el indice.
@@ -86,14 +116,15 @@ def slice_to_be_section(text: str) -> str:
     Returns:
         Texto de la seccion TO-BE extraida
     """
+    # Los patrones corren directo sobre str: CPython ya guarda el texto
+    # ASCII con 1 byte por caracter, asi que pasarlo a bytes solo sumaria
+    # una copia. Por lo mismo, el chequeo de vacio usa isspace() en vez
+    # de strip(), que copiaria el documento completo.
     normalized = (text or "").replace("\r\n", "\n").replace("\r", "\n")
-    if not normalized.strip():
+    if not normalized or normalized.isspace():
         return ""
 
-    starts = list(_TO_BE_START_RE.finditer(normalized))
-    if not starts:
-        starts = list(_TO_BE_START_FALLBACK_RE.finditer(normalized))
-
+    starts = _prefer_numbered(list(_TO_BE_START_RE.finditer(normalized)))
     if not starts:
         return ""
 
@@ -101,13 +132,16 @@ def slice_to_be_section(text: str) -> str:
     best_dist: int | None = None
 
     for match in starts:
-        lookahead_end = match.end() + _LOOKAHEAD_CHARS
-        lookahead = normalized[match.end() : lookahead_end]
-        action_match = _ACTION_MARKER_RE.search(lookahead)
+        # Busca dentro de la ventana con pos/endpos, sin copiar el texto
+        action_match = _ACTION_MARKER_RE.search(
+            normalized,
+            match.end(),
+            match.end() + _LOOKAHEAD_CHARS,
+        )
         if not action_match:
             continue
 
-        dist = action_match.start()
+        dist = action_match.start() - match.end()
         if best_start is None or best_dist is None or dist < best_dist:
             best_start = match
             best_dist = dist
@@ -116,12 +150,15 @@ def slice_to_be_section(text: str) -> str:
     start_match = best_start or starts[-1]
     start_pos = start_match.end()
 
-    end_match = _TO_BE_END_RE.search(normalized, pos=start_pos)
-    if end_match is None:
-        end_match = _TO_BE_END_FALLBACK_RE.search(
-            normalized,
-            pos=start_pos
-        )
+    # Primera coincidencia con "2.5"; si no hay, la primera sin numero.
+    # El recorrido se corta en cuanto aparece una numerada.
+    end_match: re.Match[str] | None = None
+    for match in _TO_BE_END_RE.finditer(normalized, pos=start_pos):
+        if match.group(1):
+            end_match = match
+            break
+        if end_match is None:
+            end_match = match
 
     end_pos = end_match.start() if end_match else len(normalized)
 
@@ -137,22 +174,42 @@ _NOISE_RE: Final[re.Pattern[str]] = re.compile(
     r"Fecha de emisión.*|PDD_.*|ID\s*(?:del|de)?\s*proyecto.*)\s*$"
 )
 
-# Caso A: "12. Nombre de la accion: Escenario"
-# (tambien soporta "1.1.1. | Nombre ...").
-_ACTION_SAME_LINE_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)^\s*(\d{1,3}(?:\.\d{1,3})*)\.?\s*(?:\|\s*)?"
-    r"Nombre\s+de\s+la\s+acci[oó]n\s*:\s*(.+?)\s*$"
+# Primeras letras posibles de las alternativas de _NOISE_RE (con
+# IGNORECASE, "i" tambien coincide con "\u0130" y "\u0131")
+_NOISE_FIRST_CHARS: Final[frozenset[str]] = frozenset(
+    "PpIiCcTtDdVvFf\u0130\u0131"
 )
 
-# Caso B: "12." en una linea (o "1.1.1.") y el nombre en las siguientes
-_NUM_ONLY_RE: Final[re.Pattern[str]] = re.compile(
-    r"(?i)^\s*(\d{1,3}(?:\.\d{1,3})*)\.?\s*$"
+# Celdas que solo contienen un bullet suelto
+_BULLET_GLYPHS: Final[frozenset[str]] = frozenset({"◦", "•"})
+
+# Partes cortas (encabezados, celdas repetidas de tablas PDF) se internan
+# para compartir una sola copia; el texto largo del bloque no
+_INTERN_MAX_LEN: Final[int] = 64
+
+# Encabezado de accion en una sola linea, en un solo patron:
+# - Caso A: "12. Nombre de la accion: Escenario"
+#   (tambien soporta "1.1.1. | Nombre ..."); el grupo 2 es el nombre
+# - Caso B: "12." en una linea (o "1.1.1.") y el nombre en las
+#   siguientes; el grupo 2 queda en None
+# Ambos casos son excluyentes (B no admite texto despues del numero),
+# por lo que el patron combinado captura lo mismo que los dos separados.
+_HEADER_LINE_RE: Final[re.Pattern[str]] = re.compile(
+    r"(?i)^\s*(\d{1,3}(?:\.\d{1,3})*)\.?\s*"
+    r"(?:(?:\|\s*)?Nombre\s+de\s+la\s+acci[oó]n\s*:\s*(.+?))?\s*$"
 )
 
 _NAME_LINE_RE: Final[re.Pattern[str]] = re.compile(
     r"(?i)^\s*(?:\|\s*)?Nombre\s+de\s+la\s+acci[oó]n\s*:\s*(.*)\s*$"
 )
 
+# Patrones de los helpers de normalizacion de numeros y nombres
+_MULTI_WS_RE: Final[re.Pattern[str]] = re.compile(r"\s{2,}")
+_NON_NUM_DOT_RE: Final[re.Pattern[str]] = re.compile(r"[^0-9.]")
+_NAME_STRIP_RE: Final[re.Pattern[str]] = re.compile(
+    r"(?i)\bNombre\s+de\s+la\s+acci[oó]n\s*:"
+)
+
 _LOOKAHEAD_LINES: Final[int] = 8
 
 
@@ -166,26 +223,26 @@ def _normalize(text: str) -> list[str]:
     Returns:
         Lista de lineas normalizadas y filtradas
     """
-    normalized = (text or "").replace("\r\n", "\n").replace("\r", "\n")
-    normalized = normalized.replace("\u200b", "")
+    # En DOCX tablas: separar por celdas para recuperar encabezados y
+    # marcadores. Con "|" traducido a salto de linea, un solo splitlines
+    # separa lineas y celdas ("\r\n" y "\r" tambien cortan ahi)
+    normalized = (text or "").translate(_NORMALIZE_TABLE)
 
     out: list[str] = []
     for line in normalized.splitlines():
-        stripped = line.strip()
-        if not stripped:
+        part = line.strip()
+        if not part:
             continue
 
-        # En DOCX tablas: separar por celdas para recuperar
-        # encabezados y marcadores
-        parts = [
-            p.strip() for p in stripped.split(_TABLE_CELL_SEP) if p.strip()
-        ]
-        for part in parts:
-            if _NOISE_RE.match(part):
-                continue
-            if part in {"◦", "•"}:
-                continue
-            out.append(part)
+        # Solo las partes que empiezan como alguna alternativa de
+        # _NOISE_RE pueden ser ruido; el resto no pasa por la regex
+        if part[0] in _NOISE_FIRST_CHARS and _NOISE_RE.match(part):
+            continue
+        if part in _BULLET_GLYPHS:
+            continue
+        if len(part) < _INTERN_MAX_LEN:
+            part = sys.intern(part)
+        out.append(part)
 
     return out
 
@@ -207,7 +264,7 @@ def _parse_action_number(num_str: str) -> int:
         Numero de accion como entero
     """
     raw = (num_str or "").strip()
-    raw = re.sub(r"[^0-9.]", "", raw).strip(".")
+    raw = _NON_NUM_DOT_RE.sub("", raw).strip(".")
     if not raw:
         return 0
 
@@ -231,9 +288,9 @@ def _clean_scenario_name(text: str) -> str:
         Nombre del escenario limpio
     """
     s = (text or "").strip()
-    s = re.split(r"(?i)\bNombre\s+de\s+la\s+acci[oó]n\s*:", s)[0].strip()
+    s = _NAME_STRIP_RE.split(s)[0].strip()
     s = s.replace("|", " ").strip()
-    s = re.sub(r"\s{2,}", " ", s)
+    s = _MULTI_WS_RE.sub(" ", s)
     return s or "InputText"
 
 
@@ -248,7 +305,7 @@ def _action_key(num_str: str) -> str:
         Clave normalizada para la accion
     """
     raw = (num_str or "").strip()
-    raw = re.sub(r"[^0-9.]", "", raw).strip(".")
+    raw = _NON_NUM_DOT_RE.sub("", raw).strip(".")
     return raw
 
 
@@ -267,11 +324,13 @@ def _scenario_key(text: str) -> str:
     s = s.replace(""", '"').replace(""", '"')
     s = s.replace("'", "'").replace("'", "'")
     s = s.replace("|", " ")
-    s = re.sub(r"\s{2,}", " ", s)
+    s = _MULTI_WS_RE.sub(" ", s)
     return s[:120]
 
 
-def _allow_hierarchical_headers(lines: list[str]) -> bool:
+def _allow_hierarchical_headers(
+    header_matches: list[re.Match[str] | None],
+) -> bool:
     """
     Decide si permitimos numeracion jerarquica (33.1, 1.1.1) como
     encabezado.
@@ -283,7 +342,7 @@ def _allow_hierarchical_headers(lines: list[str]) -> bool:
       los permitimos
 
     Args:
-        lines: Lista de lineas del documento
+        header_matches: Resultado de _HEADER_LINE_RE por linea
 
     Returns:
         True si se permiten encabezados jerarquicos, False en caso
@@ -292,8 +351,7 @@ def _allow_hierarchical_headers(lines: list[str]) -> bool:
     simple = 0
     hierarchical = 0
 
-    for line in lines[:2000]:
-        m = _ACTION_SAME_LINE_RE.match(line) or _NUM_ONLY_RE.match(line)
+    for m in header_matches[:2000]:
         if not m:
             continue
 
@@ -330,7 +388,7 @@ def _is_valid_header_num(
         True si es un numero de header valido, False en caso contrario
     """
     s = (num_raw or "").strip()
-    s = re.sub(r"[^0-9.]", "", s).strip(".")
+    s = _NON_NUM_DOT_RE.sub("", s).strip(".")
     if not s:
         return False
 
@@ -347,6 +405,7 @@ def _is_valid_header_num(
 def _detect_header(
     lines: list[str],
     i: int,
+    header_match: re.Match[str] | None,
     *,
     allow_hierarchical: bool,
 ) -> tuple[str, int, str, int] | None:
@@ -356,64 +415,56 @@ def _detect_header(
     Args:
         lines: Lista de lineas del documento
         i: Indice de la linea a evaluar
+        header_match: Resultado de _HEADER_LINE_RE sobre lines[i]
         allow_hierarchical: Si se permiten encabezados jerarquicos
 
     Returns:
         Tupla (dedupe_key, req_num_int, scenario_name,
         skip_lines_for_duplicate) o None si no es encabezado
     """
-    line = lines[i]
+    if not header_match:
+        return None
 
-    # Caso A: "N(.?) Nombre de la accion: <titulo>"
-    m1 = _ACTION_SAME_LINE_RE.match(line)
-    if m1:
-        num_raw = m1.group(1)
-        is_valid = _is_valid_header_num(
-            num_raw,
-            allow_hierarchical=allow_hierarchical
-        )
-        if not is_valid:
-            return None
+    num_raw = header_match.group(1)
+    is_valid = _is_valid_header_num(
+        num_raw,
+        allow_hierarchical=allow_hierarchical
+    )
+    if not is_valid:
+        return None
 
-        scenario = _clean_scenario_name(m1.group(2))
+    # Caso A: "N(.?) Nombre de la accion: <titulo>"
+    same_line_name = header_match.group(2)
+    if same_line_name is not None:
+        scenario = _clean_scenario_name(same_line_name)
         key = f"{_action_key(num_raw)}|{_scenario_key(scenario)}"
         req_num = _parse_action_number(num_raw)
         return key, req_num, scenario, 1
 
     # Caso B: "N" o "N." en una linea y el nombre en las siguientes
-    m2 = _NUM_ONLY_RE.match(line)
-    if m2:
-        num_raw = m2.group(1)
-        is_valid = _is_valid_header_num(
-            num_raw,
-            allow_hierarchical=allow_hierarchical
-        )
-        if not is_valid:
-            return None
+    req_num = _parse_action_number(num_raw)
 
-        req_num = _parse_action_number(num_raw)
-
-        max_j = min(i + 1 + _LOOKAHEAD_LINES, len(lines))
-        for j in range(i + 1, max_j):
-            mn = _NAME_LINE_RE.match(lines[j])
-            if not mn:
-                continue
+    max_j = min(i + 1 + _LOOKAHEAD_LINES, len(lines))
+    for j in range(i + 1, max_j):
+        mn = _NAME_LINE_RE.match(lines[j])
+        if not mn:
+            continue
 
-            tail = (mn.group(1) or "").strip()
-            if tail:
-                scenario = _clean_scenario_name(tail)
-                key_value = _action_key(num_raw)
-                scenario_key_value = _scenario_key(scenario)
-                key = f"{key_value}|{scenario_key_value}"
-                return key, req_num, scenario, (j - i + 1)
-
-            has_next_line = j + 1 < len(lines) and lines[j + 1].strip()
-            if has_next_line:
-                scenario = _clean_scenario_name(lines[j + 1])
-                key_value = _action_key(num_raw)
-                scenario_key_value = _scenario_key(scenario)
-                key = f"{key_value}|{scenario_key_value}"
-                return key, req_num, scenario, (j - i + 2)
+        tail = (mn.group(1) or "").strip()
+        if tail:
+            scenario = _clean_scenario_name(tail)
+            key_value = _action_key(num_raw)
+            scenario_key_value = _scenario_key(scenario)
+            key = f"{key_value}|{scenario_key_value}"
+            return key, req_num, scenario, (j - i + 1)
+
+        has_next_line = j + 1 < len(lines) and lines[j + 1].strip()
+        if has_next_line:
+            scenario = _clean_scenario_name(lines[j + 1])
+            key_value = _action_key(num_raw)
+            scenario_key_value = _scenario_key(scenario)
+            key = f"{key_value}|{scenario_key_value}"
+            return key, req_num, scenario, (j - i + 2)
 
     return None
 
@@ -440,7 +491,15 @@ def split_by_requirement(text: str) -> list[RequirementBlock]:
     if not lines:
         return []
 
-    allow_hierarchical = _allow_hierarchical_headers(lines)
+    # Cada linea se evalua una sola vez contra el patron de encabezado;
+    # el resultado se reutiliza en la heuristica y en el recorrido.
+    # Las lineas ya vienen sin espacios en los extremos, asi que un
+    # encabezado empieza con digito: el resto no pasa por la regex
+    header_matches = [
+        _HEADER_LINE_RE.match(line) if line[0].isdigit() else None
+        for line in lines
+    ]
+    allow_hierarchical = _allow_hierarchical_headers(header_matches)
 
     blocks: list[RequirementBlock] = []
     seen_headers: set[str] = set()
@@ -471,6 +530,7 @@ def split_by_requirement(text: str) -> list[RequirementBlock]:
         header = _detect_header(
             lines,
             i,
+            header_matches[i],
             allow_hierarchical=allow_hierarchical
         )
         if header:
@@ -522,6 +582,9 @@ _PROJECT_ID_LABELS = [
 
 _PROJECT_ID_LOOKAHEAD_CHARS = 600
 
+# Separadores de tabla y saltos de linea a espacio (busqueda del ID)
+_ID_TRANS = str.maketrans({"|": " ", "\n": " "})
+
 
 def _is_valid_project_id(candidate: str) -> bool:
     """
@@ -589,20 +652,26 @@ def extract_project_id(text: str) -> str | None:
         ID del proyecto o None si no se encuentra
     """
     t = (text or "").replace("\r\n", "\n").replace("\r", "\n")
-    if not t.strip():
+    if not t or t.isspace():
         return None
 
+    # Tolerancia por extraccion en tablas (DOCX/PDF): el ID se busca
+    # sobre una copia plana del documento (misma longitud), traducida
+    # una sola vez. Las etiquetas se siguen buscando sobre el texto
+    # original.
+    t_flat = t.translate(_ID_TRANS)
+
     best_id: str | None = None
     best_score: tuple[int, int, int] | None = None
 
     for label_re, label_priority in _PROJECT_ID_LABELS:
         for m in label_re.finditer(t):
             lookahead_end = m.end() + _PROJECT_ID_LOOKAHEAD_CHARS
-            lookahead = t[m.end() : lookahead_end]
-            # Tolerancia por extraccion en tablas (DOCX/PDF)
-            lookahead = lookahead.replace("|", " ").replace("\n", " ")
-
-            id_match = _PROJECT_ID_TOKEN_RE.search(lookahead)
+            id_match = _PROJECT_ID_TOKEN_RE.search(
+                t_flat,
+                m.end(),
+                lookahead_end,
+            )
             if not id_match:
                 continue
 
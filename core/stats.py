@@ -16,12 +16,24 @@ Nota: No modifica el CSV, solo lo analiza para metricas de UI.
 from __future__ import annotations
 
 import csv
-import io
 import re
 
+from core.ado_csv import _iter_lines
+
 # Patrones de expresiones regulares
 REQ_TC_RE = re.compile(r"^\d{3}$")
 
+# Ultimos dos bloques XXX del Title (PROJECT.REQ.TC) en una sola busqueda.
+# Equivale a separar por "." descartando bloques vacios y validar los dos
+# ultimos con REQ_TC_RE; el grupo 1 es el requirement.
+TITLE_REQ_TC_RE = re.compile(r"(?:^|\.)\s*(\d{3})\s*(?:\.\s*)+\d{3}[\s.]*\Z")
+
+# Separador de bullets (los espacios alrededor se recortan por item)
+BULLET_CHAR = "•"
+
+# Saltos de linea restantes a espacio en una sola pasada
+NEWLINE_TO_SPACE = str.maketrans({"\r": " ", "\n": " "})
+
 # Constantes de estructura ADO
 ADO_NCOLS = 15
 
@@ -45,6 +57,25 @@ LIMIT_REACHED_LEGACY_RE = re.compile(
 )
 
 
+def _cell(row: list[str], idx: int) -> str:
+    """
+    Retorna la celda idx sin espacios, o "" si la fila es mas corta.
+
+    Evita rellenar cada fila a 15 columnas solo para leerla.
+
+    Args:
+        row: Fila CSV (puede tener menos o mas de 15 columnas)
+        idx: Indice de columna ADO
+
+    Returns:
+        Valor de la celda sin espacios en los extremos
+    """
+    if idx >= len(row):
+        return ""
+    value = row[idx]
+    return value.strip() if value else ""
+
+
 def _count_bullets(obj: str) -> list[str]:
     """
     Extrae bullets en una sola celda.
@@ -57,12 +88,15 @@ def _count_bullets(obj: str) -> list[str]:
     Returns:
         Lista de items separados por bullets
     """
-    s = (obj or "").replace("\r\n", " ")
-    s = s.replace("\r", " ").replace("\n", " ").strip()
+    s = obj or ""
+    if "\r" in s:
+        # "\r\n" cuenta como un solo espacio
+        s = s.replace("\r\n", " ")
+    s = s.translate(NEWLINE_TO_SPACE).strip()
     if not s:
         return []
-    parts = [x.strip() for x in re.split(r"\s*•\s*", s) if x.strip()]
-    return parts
+    parts = [x.strip() for x in s.split(BULLET_CHAR)]
+    return [x for x in parts if x]
 
 
 def _tc_num_from_title(title: str) -> int | None:
@@ -89,7 +123,14 @@ def _tc_num_from_title(title: str) -> int | None:
         return None
 
 
-def _is_limit_row(row: list[str]) -> tuple[bool, dict]:
+def _is_limit_row(
+    *,
+    title: str,
+    test_step: str,
+    step_action: str,
+    expected_result: str,
+    obj: str,
+) -> tuple[bool, dict]:
     """
     Detecta si la fila es la fila final de Limit reached.
 
@@ -101,18 +142,19 @@ def _is_limit_row(row: list[str]) -> tuple[bool, dict]:
     Legado:
     - Step action inicia con "(Limit reached): Generated X of Y ..."
 
+    Recibe las celdas ya extraidas y sin espacios (ver _cell), para no
+    volver a leerlas de la fila.
+
     Args:
-        row: Fila CSV a evaluar
+        title: Celda Title
+        test_step: Celda Test Step
+        step_action: Celda Step Action
+        expected_result: Celda Expected Result
+        obj: Celda Objetive
 
     Returns:
         Tupla (es_limit_row, diccionario_con_detalles)
     """
-    step_action = (row[IDX_STEP_ACTION] or "").strip()
-    expected_result = (row[IDX_EXPECTED_RESULT] or "").strip()
-    obj = (row[IDX_OBJETIVE] or "").strip()
-    test_step = (row[IDX_TEST_STEP] or "").strip()
-    title = (row[IDX_TITLE] or "").strip()
-
     tc_num = _tc_num_from_title(title)
 
     # Nuevo formato: marca EXACTA en Expected result
@@ -194,7 +236,9 @@ def compute_csv_stats(csv_text: str) -> dict:
             "requirements_limit_reached_detail": [],
         }
 
-    reader = csv.reader(io.StringIO(txt), delimiter=",", quotechar='"')
+    # Las lineas se entregan al reader a medida que las pide: no se
+    # materializa una copia del CSV en io.StringIO
+    reader = csv.reader(_iter_lines(txt), delimiter=",", quotechar='"')
 
     requirements: set[str] = set()
     not_testable: set[str] = set()
@@ -217,32 +261,29 @@ def compute_csv_stats(csv_text: str) -> dict:
         if is_header:
             continue
 
-        # Normaliza a 15 columnas sin romper metricas
-        if len(row) < ADO_NCOLS:
-            row = row + [""] * (ADO_NCOLS - len(row))
-        elif len(row) > ADO_NCOLS:
-            row = row[:ADO_NCOLS]
-
-        work_item_type = (row[IDX_WORK_ITEM] or "").strip()
-        title = (row[IDX_TITLE] or "").strip()
-        expected_result = (row[IDX_EXPECTED_RESULT] or "").strip()
+        # Filas de ancho distinto a 15 se leen con _cell (las columnas
+        # faltantes cuentan como vacias) sin copiar ni rellenar la fila
+        work_item_type = _cell(row, IDX_WORK_ITEM)
+        title = _cell(row, IDX_TITLE)
+        expected_result = _cell(row, IDX_EXPECTED_RESULT)
 
         # Detecta requirement desde Title
         if title:
-            parts = [p.strip() for p in title.split(".") if p.strip()]
-            has_req_and_tc = (
-                len(parts) >= 2
-                and REQ_TC_RE.match(parts[-2])
-                and REQ_TC_RE.match(parts[-1])
-            )
-            if has_req_and_tc:
-                current_req = parts[-2]
+            req_match = TITLE_REQ_TC_RE.search(title)
+            if req_match:
+                current_req = req_match.group(1)
 
         if current_req:
             requirements.add(current_req)
 
-        # Detecta limit row
-        is_limit, info = _is_limit_row(row)
+        # Detecta limit row (reutiliza Title y Expected result)
+        is_limit, info = _is_limit_row(
+            title=title,
+            test_step=_cell(row, IDX_TEST_STEP),
+            step_action=_cell(row, IDX_STEP_ACTION),
+            expected_result=expected_result,
+            obj=_cell(row, IDX_OBJETIVE),
+        )
         if is_limit and current_req:
             limit_reached.add(current_req)
             limit_detail_by_req[current_req] = {
@@ -266,8 +307,8 @@ def compute_csv_stats(csv_text: str) -> dict:
             if current_req and is_not_testable:
                 not_testable.add(current_req)
 
-    not_testable_list = sorted(not_testable, key=lambda x: int(x))
-    limit_list = sorted(limit_reached, key=lambda x: int(x))
+    not_testable_list = sorted(not_testable, key=int)
+    limit_list = sorted(limit_reached, key=int)
 
     detail_list = [
         limit_detail_by_req[r] for r in limit_list if r in limit_detail_by_req
@@ -0,0 +1,402 @@
+"""
+Pruebas de regresion para el nucleo de procesamiento.
+
+Los valores esperados se obtuvieron ejecutando la implementacion original
+(previa a las optimizaciones) con las mismas entradas, de modo que cualquier
+cambio de comportamiento en el parseo CSV, la normalizacion de filas, la
+extraccion del CSV de la respuesta, el splitter o el context pack se detecte
+aqui.
+"""
+
+from __future__ import annotations
+
+import copy
+
+from django.test import SimpleTestCase
+
+from core.ado_csv import (
+    ADO_CSV_HEADER,
+    ADO_NCOLS,
+    dump_ado_rows,
+    enforce_structure_and_titles,
+    enforce_structure_and_titles_text,
+    parse_ado_rows,
+)
+from core.context_pack import build_context_pack
+from core.generator import _find_verbatim_header, extract_csv_only
+from core.requirements_splitter import (
+    extract_project_id,
+    slice_to_be_section,
+    split_by_requirement,
+)
+
+ENFORCE_KWARGS = dict(
+    project_id="PRJ",
+    requirement_number=7,
+    tc_start=1,
+    state="Design",
+    area_path="PRJ",
+    assigned_to="me",
+)
+
+
+def _row(**cells: str) -> list[str]:
+    """Construye una fila ADO vacia con las celdas indicadas por indice (c0..c14)."""
+    row = [""] * ADO_NCOLS
+    for key, value in cells.items():
+        row[int(key[1:])] = value
+    return row
+
+
+def _tc(
+    title: str, priority: str, expected: str, objective: str, **cells: str
+) -> list[str]:
+    """Fila de Test Case ya normalizada con los valores fijos de ENFORCE_KWARGS."""
+    return _row(
+        c1="Test Case",
+        c2=title,
+        c6="Functional",
+        c7=priority,
+        c8=expected,
+        c9=objective,
+        c12="Design",
+        c13="PRJ",
+        c14="me",
+        **cells,
+    )
+
+
+def _step(num: str, action: str, expected: str = "") -> list[str]:
+    """Fila de paso."""
+    return _row(c3=num, c4=action, c5=expected)
+
+
+class AdoCsvRoundTripTests(SimpleTestCase):
+    """parse_ado_rows / dump_ado_rows."""
+
+    CSV_TEXT = (
+        "\ufeff" + ADO_CSV_HEADER + "\n"
+        ',Test Case,"Login, con coma",,,,Functional,1,Ok,"Que el bot ""entre""",'
+        'Escenario,"Linea 1\nLinea 2",Design,PRJ,me\n'
+        ",,,1,Abre la app,Se abre,,,,,,,,,\n"
+        ",,,2,Corta\n"
+        ",,,3,Con coma final,Ok,,,,,,,,,,\n"
+        "   \n"
+    )
+    ROWS = [
+        _row(
+            c1="Test Case",
+            c2="Login, con coma",
+            c6="Functional",
+            c7="1",
+            c8="Ok",
+            c9='Que el bot "entre"',
+            c10="Escenario",
+            c11="Linea 1\nLinea 2",
+            c12="Design",
+            c13="PRJ",
+            c14="me",
+        ),
+        _step("1", "Abre la app", "Se abre"),
+        _step("2", "Corta"),
+        _step("3", "Con coma final", "Ok"),
+    ]
+    DUMPED = (
+        ',Test Case,"Login, con coma",,,,Functional,1,Ok,"Que el bot ""entre""",'
+        'Escenario,"Linea 1\nLinea 2",Design,PRJ,me\n'
+        ",,,1,Abre la app,Se abre,,,,,,,,,\n"
+        ",,,2,Corta,,,,,,,,,,\n"
+        ",,,3,Con coma final,Ok,,,,,,,,,"
+    )
+
+    def test_parse(self):
+        self.assertEqual(parse_ado_rows(self.CSV_TEXT), self.ROWS)
+
+    def test_dump(self):
+        self.assertEqual(dump_ado_rows(self.ROWS), self.DUMPED)
+
+    def test_round_trip(self):
+        self.assertEqual(parse_ado_rows(dump_ado_rows(self.ROWS)), self.ROWS)
+
+    def test_extra_column_with_content_raises(self):
+        with self.assertRaises(ValueError):
+            parse_ado_rows(",,,1,a,b,,,,,,,,,,contenido\n")
+
+
+class EnforceStructureTests(SimpleTestCase):
+    """enforce_structure_and_titles: titulos, metadata, corrimientos y Limit reached."""
+
+    ROWS = [
+        # Step action en metadata (se mueve al paso 1) y prioridad invalida
+        _row(
+            c0="9",
+            c1="Test Case",
+            c2="x",
+            c4="Abrir\nmenu",
+            c5="Se abre",
+            c7="7",
+            c8="Ok",
+            c9="Que el bot abra",
+            c10="Esc",
+            c11="Pre 1\r\nPre 2",
+            c12="Closed",
+            c13="Otra",
+            c14="otro",
+        ),
+        _step("5", "Paso dos", "Resultado"),
+        _step("6", "", "Sin accion"),
+        # Corrimiento de columnas: "functional" duplicado en Priority
+        _row(
+            c1="Test Case",
+            c2="y",
+            c6="Functional",
+            c7="functional",
+            c8="2",
+            c9="Resultado esperado",
+            c10="Que el bot valide",
+            c11="Escenario",
+        ),
+        _step("1", "Valida"),
+        # Marcador explicito de Limit reached; lo posterior se ignora
+        _row(
+            c1="test case",
+            c2="z",
+            c7="1",
+            c8="(Limit reached): Generated 1",
+            c9="\u00b7 Que el bot a \u25e6 Que el bot b",
+        ),
+        _step("1", "Ignorado"),
+    ]
+    EXPECTED = [
+        _tc(
+            "PRJ.007.001",
+            "1",
+            "Ok",
+            "Que el bot abra",
+            c10="Esc",
+            c11="Pre 1 \u2022 Pre 2",
+        ),
+        _step("1", "Abrir \u2022 menu", "Se abre"),
+        _step("2", "Paso dos", "Resultado"),
+        _tc(
+            "PRJ.007.002",
+            "2",
+            "Resultado esperado",
+            "Que el bot valide",
+            c10="Escenario",
+        ),
+        _step("1", "Valida"),
+        _tc(
+            "PRJ.007.003",
+            "1",
+            "(Limit reached)",
+            " \u2022 Que el bot a \u2022 Que el bot b",
+        ),
+    ]
+
+    def test_titles_metadata_and_shift_repair(self):
+        rows, count = enforce_structure_and_titles(
+            copy.deepcopy(self.ROWS), **ENFORCE_KWARGS
+        )
+        self.assertEqual(rows, self.EXPECTED)
+        self.assertEqual(count, 3)
+
+    def test_limit_row_detected_by_omitted_objectives(self):
+        rows = [_step("1", "Huerfano")]
+        rows += [
+            _row(c1="Test Case", c2=f"t{i}", c7="1", c8="Ok", c9="Objetivo")
+            for i in range(10)
+        ]
+        rows.append(
+            _row(
+                c1="Test Case",
+                c2="t11",
+                c7="1",
+                c9="\u2022 Que el bot x \u2022 Que el bot y",
+            )
+        )
+        out, count = enforce_structure_and_titles(rows, **ENFORCE_KWARGS)
+        expected = [
+            _tc(f"PRJ.007.{i:03d}", "1", "Ok", "Objetivo") for i in range(1, 11)
+        ]
+        expected.append(
+            _tc(
+                "PRJ.007.011",
+                "1",
+                "(Limit reached)",
+                " \u2022 Que el bot x \u2022 Que el bot y",
+            )
+        )
+        self.assertEqual(out, expected)
+        self.assertEqual(count, 11)
+
+    def test_text_variant_matches_rows_variant(self):
+        rows, count = enforce_structure_and_titles(
+            copy.deepcopy(self.ROWS), **ENFORCE_KWARGS
+        )
+        text, text_count = enforce_structure_and_titles_text(
+            dump_ado_rows(copy.deepcopy(self.ROWS)), **ENFORCE_KWARGS
+        )
+        self.assertEqual(text, dump_ado_rows(rows))
+        self.assertEqual(text_count, count)
+
+
+class ExtractCsvTests(SimpleTestCase):
+    """_find_verbatim_header / extract_csv_only."""
+
+    def test_find_verbatim_header(self):
+        self.assertEqual(_find_verbatim_header(ADO_CSV_HEADER + "\n,Test Case,t"), 0)
+        self.assertEqual(
+            _find_verbatim_header("Aqui va el CSV:\n" + ADO_CSV_HEADER + "\r\n"), 16
+        )
+        self.assertEqual(_find_verbatim_header("x" + ADO_CSV_HEADER + "\n"), -1)
+        self.assertEqual(
+            _find_verbatim_header(
+                ADO_CSV_HEADER.replace(",", ", ") + "\n" + ADO_CSV_HEADER + "\n"
+            ),
+            -1,
+        )
+        self.assertEqual(_find_verbatim_header(",Test Case,t,,,,,,,,,,,,"), -1)
+
+    def test_extract_csv_only(self):
+        body = ",Test Case,t,,,,,,,,,,,,"
+        step = ",,,1,a,,,,,,,,,,"
+        spaced = ADO_CSV_HEADER.replace(",", " , ")
+        cases = [
+            (ADO_CSV_HEADER + "\n" + body, ADO_CSV_HEADER + "\n" + body),
+            (
+                "Aqui va el CSV:\n" + ADO_CSV_HEADER + "\r\n" + step,
+                ADO_CSV_HEADER + "\n" + step,
+            ),
+            (
+                "```csv\n" + ADO_CSV_HEADER + "\n" + body + "\n```",
+                ADO_CSV_HEADER + "\n" + body,
+            ),
+            ("x" + ADO_CSV_HEADER + "\n" + step, step),
+            ("Texto\n" + spaced + "\n" + step, spaced + "\n" + step),
+            ("Claro, aqui esta:\n  " + body + "\n" + step, body + "\n" + step),
+            (body, body),
+            ("No pude generar casos.", "No pude generar casos."),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text[:30]):
+                self.assertEqual(extract_csv_only(text), expected)
+
+
+SPLITTER_DOC = (
+    "Portada\n"
+    "ID del proyecto: ABC.123\n"
+    "2.4 Acciones detalladas del proceso TO-BE\n"
+    "1. Nombre de la acci\u00f3n: Descargar reporte\n"
+    "El bot descarga el reporte .csv desde SharePoint.\n"
+    "05\n"
+    "2\n"
+    "Nombre de la acci\u00f3n:\n"
+    "Validar datos | Sistema: SAP\n"
+    "Nota: revisar formato dd/mm/yyyy\n"
+    "1. Nombre de la acci\u00f3n: Descargar reporte\n"
+    "Texto repetido tras salto de pagina\n"
+    "3 Nombre de la acci\u00f3n: Enviar correo\n"
+    "Usa el archivo obtenido en la actividad 1 y lo envia por Outlook.\n"
+    "Nota: revisar formato dd/mm/yyyy\n"
+    "2.5 Matriz de criterios de aceptaci\u00f3n\n"
+    "Fin\n"
+)
+
+
+class RequirementsSplitterTests(SimpleTestCase):
+    """Deteccion de encabezados de requerimiento y recorte del TO-BE."""
+
+    def test_extract_project_id(self):
+        self.assertEqual(extract_project_id(SPLITTER_DOC), "ABC.123")
+
+    def test_slice_to_be_section(self):
+        to_be = slice_to_be_section(SPLITTER_DOC)
+        self.assertTrue(
+            to_be.startswith("1. Nombre de la acci\u00f3n: Descargar reporte\n")
+        )
+        self.assertTrue(to_be.endswith("\nNota: revisar formato dd/mm/yyyy"))
+        self.assertNotIn("Portada", to_be)
+        self.assertNotIn("Matriz", to_be)
+
+    def test_split_by_requirement(self):
+        blocks = split_by_requirement(slice_to_be_section(SPLITTER_DOC))
+        self.assertEqual(
+            [(b.requirement_number, b.scenario_name, b.input_text) for b in blocks],
+            [
+                (
+                    1,
+                    "Descargar reporte",
+                    "1. Nombre de la acci\u00f3n: Descargar reporte\n"
+                    "El bot descarga el reporte .csv desde SharePoint.\n"
+                    "05",
+                ),
+                (
+                    2,
+                    "Validar datos",
+                    "2\n"
+                    "Nombre de la acci\u00f3n:\n"
+                    "Validar datos\n"
+                    "Sistema: SAP\n"
+                    "Nota: revisar formato dd/mm/yyyy\n"
+                    "Texto repetido tras salto de pagina",
+                ),
+                (
+                    3,
+                    "Enviar correo",
+                    "3 Nombre de la acci\u00f3n: Enviar correo\n"
+                    "Usa el archivo obtenido en la actividad 1 y lo envia por Outlook.\n"
+                    "Nota: revisar formato dd/mm/yyyy",
+                ),
+            ],
+        )
+
+
+class ContextPackTests(SimpleTestCase):
+    """build_context_pack: sistemas, entradas/salidas, notas, referencias y formatos."""
+
+    def test_scan_labels_notes_refs_and_hints(self):
+        text = (
+            "Sistema: SAP\n"
+            "Input: \u201cReporte diario\u201d\n"
+            'Output: Archivo "Consolidado.xlsx"\n'
+            "Nota 1: Los montos van sin decimales\n"
+            "El bot toma la actividad 3 y guarda en formato dd/mm/aaaa.\n"
+            "Nota 1: Los montos van sin decimales\n"
+            "Obtenido en la actividad 12 se envia por OUTLOOK a las HH:MI\n"
+            "Archivo reporte.CSV en SharePoint y texto sin hints\n"
+            + "Oracion larga. " * 20
+            + "\n"
+        )
+        self.assertEqual(
+            build_context_pack(text),
+            "GLOBAL_CONTEXT (extracted from TO-BE; use only if applicable):\n"
+            "- Systems: SAP\n"
+            "- Inputs mentioned: \u201cReporte diario\u201d\n"
+            '- Outputs mentioned: Archivo "Consolidado.xlsx"\n'
+            "- Named folders/files (quoted): Consolidado.xlsx\n"
+            "- Repeated notes (appear multiple times):\n"
+            "  \u2022 Los montos van sin decimales\n"
+            "- Cross-activity references (dependencies):\n"
+            "  \u2022 El bot toma la actividad 3 y guarda en formato dd/mm/aaaa.\n"
+            "  \u2022 Obtenido en la actividad 12 se envia por OUTLOOK a las HH:MI\n"
+            "- Format/tooling hints (verbatim lines containing formats/tools):\n"
+            "  \u2022 El bot toma la actividad 3 y guarda en formato dd/mm/aaaa.\n"
+            "  \u2022 Obtenido en la actividad 12 se envia por OUTLOOK a las HH:MI\n"
+            "  \u2022 Archivo reporte.CSV en SharePoint y texto sin hints",
+        )
+
+    def test_splitter_to_be_section(self):
+        self.assertEqual(
+            build_context_pack(slice_to_be_section(SPLITTER_DOC)),
+            "GLOBAL_CONTEXT (extracted from TO-BE; use only if applicable):\n"
+            "- Systems: SAP\n"
+            "- Repeated notes (appear multiple times):\n"
+            "  \u2022 revisar formato dd/mm/yyyy\n"
+            "- Cross-activity references (dependencies):\n"
+            "  \u2022 Usa el archivo obtenido en la actividad 1 y lo envia por Outlook.\n"
+            "- Format/tooling hints (verbatim lines containing formats/tools):\n"
+            "  \u2022 El bot descarga el reporte .csv desde SharePoint.\n"
+            "  \u2022 Nota: revisar formato dd/mm/yyyy\n"
+            "  \u2022 Usa el archivo obtenido en la actividad 1 y lo envia por Outlook.",
+        )
@@ -16,26 +16,27 @@ from __future__ import annotations
 
 import logging
 import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Final, Iterator
 
 from django.conf import settings
 
-from core.ado_csv import (
-    dump_ado_rows,
-    enforce_structure_and_titles,
-    parse_ado_rows,
-)
+from core.ado_csv import ADO_CSV_HEADER, enforce_structure_and_titles_text
 from core.claude_client import call_claude, get_client
 from core.context_pack import build_context_pack
 from core.extractor import extract_text_from_upload
 from core.generator import extract_csv_only
 from core.requirements_splitter import (
+    RequirementBlock,
     extract_project_id,
     slice_to_be_section,
     split_by_requirement,
 )
 from core.stats import compute_csv_stats
+from tcgen.utils.validators import read_prompt_text
 
 logger = logging.getLogger(__name__)
 
@@ -68,13 +69,34 @@ MSG_ENGINE_ERROR: Final[str] = (
     "Ocurrió un error durante la generación. Revise los logs del servidor."
 )
 
-# Instrucciones de reparación para salidas no conformes al formato ADO CSV.
-REPAIR_INSTRUCTIONS: Final[str] = (
-    "\n\nREPAIR: Your previous output did not comply with ADO CSV formatting. "
-    "Return ONLY CSV rows with EXACTLY 15 columns (14 commas). "
-    "Do NOT include headers. Keep EXACTLY 15 columns (14 commas). "
-    "If you don't know State/Area Path/Assigned To, leave them empty; "
-    "the backend will populate them."
+# Reglas de formato que valida el backend, enunciadas para el reintento de
+# reparación (se agregan como segundo bloque de system, sin cache).
+REPAIR_SYSTEM_PROMPT: Final[str] = (
+    "OUTPUT FORMAT (Azure DevOps Test Case CSV), enforced by the backend:\n"
+    f"- Every row has EXACTLY 15 columns (14 commas), in this order: "
+    f"{ADO_CSV_HEADER}.\n"
+    "- Do NOT include the header row or any text outside the CSV rows.\n"
+    "- Wrap a cell in double quotes if it contains a comma, a double quote "
+    "(written as \"\") or a line break.\n"
+    "- Test Case row: Work Item Type = Test Case, a non-empty Title and an "
+    "empty Test Step; Step action and Step Expected stay empty.\n"
+    "- Step rows follow their Test Case row: Test Step = 1, 2, 3..., with "
+    "Step action and Step Expected filled and every other column empty.\n"
+    "- Title is rewritten by the backend as IdProyecto.RequirementNumber.NNN; "
+    "any non-empty value is accepted.\n"
+    "- Type of test is Functional or No Functional; Priority is 1, 2 or 3.\n"
+    "- A final (Limit reached) row, if present, is a Test Case row with no "
+    "step rows after it.\n"
+    "- Leave State, Area Path and Assigned To empty; the backend fills them."
+)
+
+# Mensaje de reparación: acompaña al mismo input (prompt y GlobalContext
+# cacheados) con el CSV que no pasó la validación.
+REPAIR_INSTRUCTIONS_TPL: Final[str] = (
+    "REPAIR: The CSV below was generated for this requirement but does not "
+    "follow the OUTPUT FORMAT rules. Rewrite it so every row follows them, "
+    "keeping the same test cases and steps. Return ONLY the CSV rows.\n\n"
+    "CSV TO REPAIR:\n%s\n"
 )
 
 # Llaves que la UI espera para métricas de límite (compatibilidad).
@@ -87,57 +109,112 @@ USAGE_OUTPUT: Final[str] = "output_tokens"
 
 NO_TC_START_DEFAULT: Final[int] = 1
 
+# Prompt caching de Anthropic: marca el prefijo estático (prompt y
+# contexto global del documento) para reutilizarlo entre bloques.
+CACHE_CONTROL_EPHEMERAL: Final[dict[str, str]] = {"type": "ephemeral"}
+
+# Plantillas del mensaje de usuario (contrato del prompt). El bloque del
+# contexto global se arma una vez por documento; el del requerimiento se
+# rellena por bloque con formato % sobre una tupla.
+_GLOBAL_CONTEXT_TPL: Final[str] = "GlobalContext:\n%s\n"
+_USER_BLOCK_TPL: Final[str] = (
+    "IdProyecto: %s\n"
+    "RequirementNumber: %s\n"
+    "ScenarioName: %s\n"
+    "NoTCStart: %s\n"
+    "InputText:\n%s\n"
+)
+
 
-def _sum_usage(
+def _add_usage(
     total: dict[str, int],
     add: dict[str, int] | None,
-) -> dict[str, int]:
+) -> None:
     """
-    Suma el uso de tokens de manera acumulativa retornando un dict nuevo.
+    Suma el uso de tokens sobre el acumulado, modificándolo en sitio.
+
+    Evita crear un dict nuevo por cada bloque procesado.
 
     Args:
-        total: Acumulado actual.
+        total: Acumulado actual (se actualiza).
         add: Incremento a sumar (puede ser None).
-
-    Returns:
-        Diccionario con input_tokens y output_tokens.
     """
-    add = add or {}
+    if not add:
+        return
+
+    total[USAGE_INPUT] = (
+        int(total.get(USAGE_INPUT, 0)) + int(add.get(USAGE_INPUT, 0))
+    )
+    total[USAGE_OUTPUT] = (
+        int(total.get(USAGE_OUTPUT, 0)) + int(add.get(USAGE_OUTPUT, 0))
+    )
 
-    total_in = int(total.get(USAGE_INPUT, 0))
-    total_out = int(total.get(USAGE_OUTPUT, 0))
-    add_in = int(add.get(USAGE_INPUT, 0))
-    add_out = int(add.get(USAGE_OUTPUT, 0))
 
-    return {
-        USAGE_INPUT: total_in + add_in,
-        USAGE_OUTPUT: total_out + add_out,
-    }
+def _text_block(text: str, *, cached: bool = False) -> dict[str, Any]:
+    """Construye un bloque de contenido de texto, opcionalmente cacheable."""
+    block: dict[str, Any] = {"type": "text", "text": text}
+    if cached:
+        block["cache_control"] = CACHE_CONTROL_EPHEMERAL
+    return block
+
+
+def _uncached(blocks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Copia los bloques sin la marca cache_control."""
+    return [
+        {k: v for k, v in block.items() if k != "cache_control"}
+        for block in blocks
+    ]
+
 
+def _global_context_block(global_context: str) -> dict[str, Any]:
+    """
+    Construye el bloque cacheable con el contexto global del documento.
+
+    Es igual para todos los bloques, así que se arma una sola vez fuera
+    del bucle de requerimientos.
+    """
+    return _text_block(_GLOBAL_CONTEXT_TPL % global_context, cached=True)
 
-def _build_user_text(
+
+def _build_user_content(
     *,
+    context_block: dict[str, Any],
     project_id: str,
     req_num: int,
     scenario_name: str,
     no_tc_start: int,
-    global_context: str,
     input_text: str,
-) -> str:
+) -> list[dict[str, Any]]:
     """
     Construye el contenido del mensaje de usuario para el LLM.
 
+    El contexto global (ya armado por _global_context_block) va primero y
+    marcado como cacheable; los campos propios del requerimiento van en un
+    segundo bloque sin marca.
+
     Nota:
         Mantiene el contrato del prompt (IdProyecto, RequirementNumber, etc.).
     """
-    return (
-        f"IdProyecto: {project_id}\n"
-        f"RequirementNumber: {req_num}\n"
-        f"ScenarioName: {scenario_name}\n"
-        f"NoTCStart: {no_tc_start}\n"
-        f"GlobalContext:\n{global_context}\n"
-        f"InputText:\n{input_text}\n"
-    )
+    return [
+        context_block,
+        _text_block(
+            _USER_BLOCK_TPL
+            % (project_id, req_num, scenario_name, no_tc_start, input_text)
+        ),
+    ]
+
+
+@lru_cache(maxsize=8)
+def _context_pack_cached(doc_text_to_be: str) -> str:
+    """
+    Memoiza build_context_pack por el texto de la sección TO-BE.
+
+    Un mismo documento (reintento síncrono tras un stream fallido o
+    regeneración con otro Assigned To) reutiliza el pack ya construido.
+    La llave es el propio texto: su hash de str ya es de una sola pasada
+    y no requiere codificarlo a bytes.
+    """
+    return build_context_pack(doc_text_to_be)
 
 
 def _error_event(code: str, message: str) -> dict[str, Any]:
@@ -149,84 +226,193 @@ def _load_prompt_text() -> str:
     """
     Carga el prompt desde settings y valida que no esté vacío.
 
+    La lectura se cachea por mtime (ver read_prompt_text).
+
     Raises:
         ValueError: Si el archivo existe pero está vacío.
         FileNotFoundError: Si el archivo no existe.
     """
-    prompt_path = settings.PROMPT_FILE
-    prompt_text = Path(prompt_path).read_text(encoding="utf-8").strip()
+    prompt_text = read_prompt_text(settings.PROMPT_FILE)
     if not prompt_text:
         raise ValueError("El archivo de prompt está vacío.")
     return prompt_text
 
 
-def _llm_to_rows(
+def _repair_max_tokens(first_output_tokens: int) -> int:
+    """
+    Calcula el tope de tokens del reintento de reparación.
+
+    La reparación reescribe la salida previa, así que basta un margen
+    sobre sus tokens de salida; MAX_TOKENS_REPAIR actúa como piso y
+    MAX_TOKENS como techo para no truncar bloques grandes.
+    """
+    needed = first_output_tokens + first_output_tokens // 4
+    return min(settings.MAX_TOKENS, max(settings.MAX_TOKENS_REPAIR, needed))
+
+
+def _normalize_csv(
+    csv_text: str,
+    *,
+    project_id: str,
+    requirement_number: int,
+    assigned_to: str,
+) -> str:
+    """
+    Parsea, normaliza y reescribe la salida CSV del LLM en una sola pasada.
+
+    Raises:
+        ValueError: Si alguna fila del CSV no es válida (columnas extra).
+    """
+    csv_rows, _ = enforce_structure_and_titles_text(
+        csv_text,
+        project_id=project_id,
+        requirement_number=requirement_number,
+        tc_start=NO_TC_START_DEFAULT,
+        state="Design",
+        area_path=project_id,
+        assigned_to=assigned_to,
+    )
+    return csv_rows.strip()
+
+
+def _llm_to_csv(
     *,
     client: Any,
     prompt_text: str,
-    user_text: str,
-) -> tuple[list[list[str]], dict[str, int]]:
+    user_content: list[dict[str, Any]],
+    project_id: str,
+    requirement_number: int,
+    assigned_to: str,
+) -> tuple[str, dict[str, int]]:
     """
-    Ejecuta el LLM y devuelve filas ADO parseadas.
+    Ejecuta el LLM y devuelve sus filas ADO ya normalizadas como CSV.
 
-    Si el output no es parseable, reintenta una vez anexando
-    REPAIR_INSTRUCTIONS.
+    El prompt de sistema se envía como bloque cacheable. Si el output no
+    es parseable, reintenta una vez con CLAUDE_MODEL_REPAIR: mismo prompt y
+    mismo input, más las reglas de formato (REPAIR_SYSTEM_PROMPT) y el CSV
+    a reparar, para que el modelo lo reformatee en vez de volver a
+    resolver el requerimiento. El reintento va sin cache_control: la caché
+    es por modelo y escribirla para una llamada que casi no se repite
+    costaría más que enviarla sin caché.
 
     Returns:
-        Tupla (rows, usage_total).
+        Tupla (csv_rows, usage_total).
     """
+    normalize_kwargs = {
+        "project_id": project_id,
+        "requirement_number": requirement_number,
+        "assigned_to": assigned_to,
+    }
+    system_blocks = [_text_block(prompt_text, cached=True)]
+
     raw_out, usage = call_claude(
         client=client,
         model=settings.CLAUDE_MODEL,
-        system_prompt=prompt_text,
-        user_text=user_text,
+        system_prompt=system_blocks,
+        user_text=user_content,
         max_tokens=settings.MAX_TOKENS,
     )
 
     csv_text = extract_csv_only(raw_out).strip()
 
     try:
-        rows = parse_ado_rows(csv_text)
-        return rows, usage
+        return _normalize_csv(csv_text, **normalize_kwargs), usage
     except ValueError:
-        user_text_retry = user_text + REPAIR_INSTRUCTIONS
+        first_output_tokens = usage.get(USAGE_OUTPUT, 0)
 
     raw_out2, usage2 = call_claude(
         client=client,
-        model=settings.CLAUDE_MODEL,
-        system_prompt=prompt_text,
-        user_text=user_text_retry,
-        max_tokens=settings.MAX_TOKENS,
+        model=settings.CLAUDE_MODEL_REPAIR or settings.CLAUDE_MODEL,
+        system_prompt=[_text_block(prompt_text), _text_block(REPAIR_SYSTEM_PROMPT)],
+        user_text=[
+            *_uncached(user_content),
+            _text_block(REPAIR_INSTRUCTIONS_TPL % raw_out),
+        ],
+        max_tokens=_repair_max_tokens(first_output_tokens),
     )
 
     csv_text2 = extract_csv_only(raw_out2).strip()
-    rows2 = parse_ado_rows(csv_text2)
+    csv_rows2 = _normalize_csv(csv_text2, **normalize_kwargs)
+
+    usage_total = {USAGE_INPUT: 0, USAGE_OUTPUT: 0}
+    _add_usage(usage_total, usage)
+    _add_usage(usage_total, usage2)
+    return csv_rows2, usage_total
+
 
-    base_usage = usage or {USAGE_INPUT: 0, USAGE_OUTPUT: 0}
-    usage_total = _sum_usage(base_usage, usage2)
-    return rows2, usage_total
+def _generate_block_rows(
+    *,
+    client: Any,
+    prompt_text: str,
+    project_id: str,
+    assigned_to: str,
+    context_block: dict[str, Any],
+    block: RequirementBlock,
+) -> tuple[str, dict[str, int], float]:
+    """
+    Genera y normaliza las filas ADO de un bloque de requerimiento.
+
+    Se ejecuta en un hilo del pool: la llamada al LLM domina el tiempo y
+    libera el GIL mientras espera la red.
+
+    Returns:
+        Tupla (csv_rows, usage, secs) con las filas del bloque ya
+        serializadas, el uso de tokens y la duración en segundos.
+    """
+    t0 = time.perf_counter()
+
+    user_content = _build_user_content(
+        context_block=context_block,
+        project_id=project_id,
+        req_num=block.requirement_number,
+        scenario_name=block.scenario_name,
+        no_tc_start=NO_TC_START_DEFAULT,
+        input_text=block.input_text,
+    )
+
+    csv_rows_clean, usage = _llm_to_csv(
+        client=client,
+        prompt_text=prompt_text,
+        user_content=user_content,
+        project_id=project_id,
+        requirement_number=block.requirement_number,
+        assigned_to=assigned_to,
+    )
+    return csv_rows_clean, usage, time.perf_counter() - t0
 
 
 def iter_generation_events(
     *,
     filename: str,
-    file_bytes: bytes,
+    file_bytes: bytes = b"",
+    file_path: str | None = None,
     assigned_to: str,
+    include_progress: bool = True,
+    cancel: threading.Event | None = None,
 ) -> Iterator[dict[str, Any]]:
     """
     Fuente única de verdad para la generación de casos de prueba.
 
+    El documento llega en memoria (file_bytes) o como ruta en disco
+    (file_path); si hay ruta, se lee desde ahí. Con
+    include_progress=False no se construyen ni emiten los eventos de
+    progreso (para consumidores que solo esperan el evento final).
+
+    Si se indica cancel y se activa (p. ej. el cliente cerró el stream),
+    no se envían más bloques al LLM y el generador termina sin evento
+    final.
+
     Eventos emitidos:
     - {"type":"meta","total_blocks":N}
     - {"type":"progress","done":i,"total":N,"req":<int>,"scenario":<str>,
-       "secs":<float>}
+       "secs":<float>}  (uno por bloque, en orden de término; el LLM se
+       llama en paralelo hasta settings.TCGEN_LLM_CONCURRENCY bloques)
     - {"type":"done","ok":True,"download_filename":...,"csv_body":...,
        "usage":...,"elapsed":...,"stats":...}
     - {"type":"error","code":"...","message":"..."}
     """
     start_all = time.perf_counter()
     usage_total: dict[str, int] = {USAGE_INPUT: 0, USAGE_OUTPUT: 0}
-    all_rows: list[str] = []
 
     try:
         assigned_to = (assigned_to or "").strip()
@@ -237,19 +423,27 @@ def iter_generation_events(
         prompt_text = _load_prompt_text()
         client = get_client()
 
-        doc_text = extract_text_from_upload(filename, file_bytes)
+        doc_text = extract_text_from_upload(
+            filename,
+            file_bytes,
+            file_path=file_path,
+        )
 
         project_id = extract_project_id(doc_text)
         if not project_id:
             yield _error_event(ERR_NO_PROJECT_ID, MSG_NO_PROJECT_ID)
             return
 
+        # slice_to_be_section ya entrega la sección recortada: basta con
+        # revisar si está vacía, sin otra copia vía strip().
         doc_text_to_be = slice_to_be_section(doc_text)
-        if not doc_text_to_be.strip():
+        if not doc_text_to_be:
             yield _error_event(ERR_NO_TOBE, MSG_NO_TOBE)
             return
 
-        context_pack = build_context_pack(doc_text_to_be)
+        context_block = _global_context_block(
+            _context_pack_cached(doc_text_to_be)
+        )
 
         blocks = split_by_requirement(doc_text_to_be)
         if not blocks:
@@ -259,51 +453,78 @@ def iter_generation_events(
         total = len(blocks)
         yield {"type": EVENT_META, "total_blocks": total}
 
-        for idx, block in enumerate(blocks, start=1):
-            t0 = time.perf_counter()
-
-            user_text = _build_user_text(
-                project_id=project_id,
-                req_num=block.requirement_number,
-                scenario_name=block.scenario_name,
-                no_tc_start=NO_TC_START_DEFAULT,
-                global_context=context_pack,
-                input_text=block.input_text,
-            )
-
-            rows, usage = _llm_to_rows(
+        # Los bloques son independientes: se mantienen hasta `workers` en
+        # vuelo y el siguiente se envía cuando uno termina, revisando antes
+        # la cancelación. El primero va solo: la caché del prompt no se
+        # puede leer hasta que una respuesta la escribe, así que lanzar
+        # todos a la vez pagaría la escritura en cada uno. El progreso se
+        # emite conforme terminan y el CSV final conserva el orden del
+        # documento gracias a block_rows.
+        block_rows: list[str] = [""] * total
+        workers = max(1, min(total, settings.TCGEN_LLM_CONCURRENCY))
+        pending = iter(enumerate(blocks))
+        in_flight: dict[Future, int] = {}
+        done = 0
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        def submit_next() -> bool:
+            if cancel is not None and cancel.is_set():
+                return False
+            nxt = next(pending, None)
+            if nxt is None:
+                return False
+            idx, block = nxt
+            future = executor.submit(
+                _generate_block_rows,
                 client=client,
                 prompt_text=prompt_text,
-                user_text=user_text,
-            )
-            usage_total = _sum_usage(usage_total, usage)
-
-            rows, _ = enforce_structure_and_titles(
-                rows,
                 project_id=project_id,
-                requirement_number=block.requirement_number,
-                tc_start=NO_TC_START_DEFAULT,
-                state="Design",
-                area_path=project_id,
                 assigned_to=assigned_to,
+                context_block=context_block,
+                block=block,
             )
-
-            csv_rows_clean = dump_ado_rows(rows).strip()
-            if csv_rows_clean:
-                all_rows.append(csv_rows_clean)
-
-            secs = time.perf_counter() - t0
-            yield {
-                "type": EVENT_PROGRESS,
-                "done": idx,
-                "total": total,
-                "req": block.requirement_number,
-                "scenario": block.scenario_name,
-                "secs": round(secs, 2),
-            }
+            in_flight[future] = idx
+            return True
+
+        try:
+            submit_next()
+
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    idx = in_flight.pop(future)
+                    csv_rows_clean, usage, secs = future.result()
+                    _add_usage(usage_total, usage)
+                    block_rows[idx] = csv_rows_clean
+                    done += 1
+                    while len(in_flight) < workers and submit_next():
+                        pass
+
+                    if not include_progress:
+                        continue
+
+                    block = blocks[idx]
+                    yield {
+                        "type": EVENT_PROGRESS,
+                        "done": done,
+                        "total": total,
+                        "req": block.requirement_number,
+                        "scenario": block.scenario_name,
+                        "secs": round(secs, 2),
+                    }
+        finally:
+            # Ante un error o si el cliente abandona el stream, no se
+            # lanzan los bloques que aún no empezaron.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if cancel is not None and cancel.is_set():
+            return
 
         elapsed = time.perf_counter() - start_all
-        csv_body = "\n".join(all_rows).strip()
+
+        # Un solo join sobre los bloques en orden: cada bloque ya viene
+        # recortado, así que el resultado no necesita strip (ni otra copia).
+        csv_body = "\n".join(filter(None, block_rows))
 
         stats = compute_csv_stats(csv_body) or {}
         stats.setdefault(STATS_LIMIT_TOTAL, 0)
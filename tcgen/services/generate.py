@@ -37,7 +37,8 @@ class GenerationResult:
 def generate_test_cases_sync(
     *,
     filename: str,
-    file_bytes: bytes,
+    file_bytes: bytes = b"",
+    file_path: str | None = None,
     assigned_to: str,
 ) -> GenerationResult:
     """
@@ -51,7 +52,9 @@ def generate_test_cases_sync(
     for evt in iter_generation_events(
         filename=filename,
         file_bytes=file_bytes,
+        file_path=file_path,
         assigned_to=assigned_to,
+        include_progress=False,
     ):
         evt_type = evt.get("type")
 
@@ -10,18 +10,18 @@ from __future__ import annotations
 
 # Importaciones de librería estándar.
 import base64
+import threading
 from pathlib import Path
 from typing import Any, Final, Iterator
 
 # Importaciones del proyecto.
-from core.ado_csv import ensure_csv_header
+from core.ado_csv import CSV_EXCEL_BOM, ensure_csv_header
 from tcgen.services.engine import iter_generation_events
 from tcgen.services.generate import generate_test_cases_sync
 
 EVENT_DONE: Final[str] = "done"
 DEFAULT_OK_CODE: Final[str] = "OK_GENERATED"
 DEFAULT_OK_MESSAGE: Final[str] = "Test cases generated successfully."
-CSV_EXCEL_ENCODING: Final[str] = "utf-8-sig"
 
 
 def build_download_filename(original_filename: str) -> str:
@@ -62,7 +62,8 @@ def build_payload(
 def run_sync(
     *,
     original_filename: str,
-    file_bytes: bytes,
+    file_bytes: bytes = b"",
+    file_path: str | None = None,
     assigned_to: str,
 ) -> dict[str, Any]:
     """
@@ -73,6 +74,7 @@ def run_sync(
     result = generate_test_cases_sync(
         filename=original_filename,
         file_bytes=file_bytes,
+        file_path=file_path,
         assigned_to=assigned_to,
     )
 
@@ -90,8 +92,10 @@ def run_sync(
 def iter_stream(
     *,
     original_filename: str,
-    file_bytes: bytes,
+    file_bytes: bytes = b"",
+    file_path: str | None = None,
     assigned_to: str,
+    cancel: threading.Event | None = None,
 ) -> Iterator[dict[str, Any]]:
     """
     Genera eventos para streaming NDJSON.
@@ -102,11 +106,14 @@ def iter_stream(
       - csv_out (con encabezado)
       - csv_b64 (para descarga directa)
       - csv_body (sin encabezado, si el motor lo proporciona)
+    - cancel se reenvía al motor para dejar de enviar bloques al LLM.
     """
     for evt in iter_generation_events(
         filename=original_filename,
         file_bytes=file_bytes,
+        file_path=file_path,
         assigned_to=assigned_to,
+        cancel=cancel,
     ):
         if evt.get("type") != EVENT_DONE:
             yield evt
@@ -146,6 +153,9 @@ def _encode_csv_b64(csv_out: str) -> str:
     """
     Convierte el CSV final a base64 usando UTF-8 con BOM.
 
-    Se conserva `utf-8-sig` para compatibilidad con Excel.
+    Se conserva el BOM (equivalente a `utf-8-sig`) para compatibilidad con
+    Excel; se antepone como bytes al UTF-8 plano, sin pasar por el codec
+    `utf-8-sig` (implementado en Python).
     """
-    return base64.b64encode(csv_out.encode(CSV_EXCEL_ENCODING)).decode("ascii")
+    csv_bytes = CSV_EXCEL_BOM + csv_out.encode("utf-8")
+    return base64.b64encode(csv_bytes).decode("ascii")
@@ -10,7 +10,9 @@ Este módulo centraliza validaciones simples para:
 
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Final, Iterable
 
@@ -31,6 +33,26 @@ MSG_BAD_MAX_UPLOAD: Final[str] = "Maximum upload size is not configured correctl
 MSG_ASSIGNED_TO_REQUIRED: Final[str] = "Assigned To is required."
 
 
+@lru_cache(maxsize=8)
+def _read_prompt_cached(path: str, mtime_ns: int) -> str:
+    """Lee y recorta el prompt; mtime_ns solo forma parte de la llave."""
+    return Path(path).read_text(encoding="utf-8").strip()
+
+
+def read_prompt_text(prompt_path: Path) -> str:
+    """
+    Retorna el texto del prompt sin espacios en los extremos.
+
+    El contenido se cachea por (ruta, mtime): cada petición solo hace un
+    stat, y editar el archivo invalida la entrada automáticamente.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe.
+    """
+    mtime_ns = os.stat(prompt_path).st_mtime_ns
+    return _read_prompt_cached(str(prompt_path), mtime_ns)
+
+
 def validate_prompt_file(prompt_path: Path) -> ValidationResult:
     """
     Valida que el archivo de prompt exista y tenga contenido.
@@ -39,10 +61,11 @@ def validate_prompt_file(prompt_path: Path) -> ValidationResult:
     - No valida estructura ni formato del prompt.
     - Solo valida existencia y que no esté vacío.
     """
-    if not prompt_path.exists():
+    try:
+        text = read_prompt_text(prompt_path)
+    except FileNotFoundError:
         return ValidationResult(False, MSG_MISSING_PROMPT)
 
-    text = prompt_path.read_text(encoding="utf-8").strip()
     if not text:
         return ValidationResult(False, MSG_EMPTY_PROMPT)
 
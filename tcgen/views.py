@@ -11,20 +11,30 @@ Este módulo expone:
 from __future__ import annotations
 
 # Importaciones de la librería estándar.
-import json
+import asyncio
+import base64
 import logging
-from typing import Any, Final, Iterator
+import threading
+import zlib
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Final, Iterator
 
-# Importaciones de terceros (Django).
+# Importaciones de terceros (Django, orjson).
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
 from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
+import orjson
 
 # Importaciones del proyecto.
-from core.extractor import SUPPORTED_EXTS
-from tcgen.services.orchestrator import iter_stream, run_sync
+# El orquestador (y con él el motor, PyMuPDF, python-docx y el SDK de
+# Anthropic) se importa dentro de las vistas de generación: home y
+# download_csv no pagan ese costo al arrancar el worker.
+from core.ado_csv import CSV_EXCEL_BOM
 from tcgen.utils.validators import validate_extension, validate_prompt_file, validate_size
 
 # IDs de Trazabilidad Técnica:
@@ -35,6 +45,10 @@ from tcgen.utils.validators import validate_extension, validate_prompt_file, val
 logger = logging.getLogger(__name__)
 
 EVENT_DONE: Final[str] = "done"
+EVENT_PROGRESS: Final[str] = "progress"
+
+# Marca de fin para la cola entre el hilo productor y el event loop.
+_STREAM_END: Final[object] = object()
 
 CONTENT_TYPE_NDJSON: Final[str] = "application/x-ndjson; charset=utf-8"
 CONTENT_TYPE_CSV: Final[str] = "text/csv; charset=utf-8"
@@ -44,6 +58,14 @@ UI_ERR_NO_FILE: Final[str] = "Please upload a file to continue."
 UI_ERR_PROMPT_FILE: Final[str] = "Prompt file is invalid or missing."
 UI_ERR_BAD_EXT: Final[str] = "Unsupported file type. Allowed: .pdf, .docx."
 UI_ERR_TOO_LARGE: Final[str] = "The file exceeds the maximum allowed size."
+# El CSV se guarda en sesión comprimido (zlib + base64): el esquema ADO es
+# muy repetitivo y reduce la escritura/lectura del backend de sesión.
+SESSION_CSV_FIELD: Final[str] = "csv_out_z"
+SESSION_CSV_ZLIB_LEVEL: Final[int] = 6
+
+# Margen para los campos no-archivo del multipart (assigned_to, token CSRF,
+# cabeceras de cada parte) al comparar Content-Length con el límite.
+UPLOAD_BODY_SLACK_BYTES: Final[int] = 64 * 1024
 UI_ERR_EMPTY_OUTPUT: Final[str] = (
     "The generated output is empty. Please try a different document."
 )
@@ -55,11 +77,45 @@ UI_ERR_ASSIGNED_TO: Final[str] = (
 )
 
 
+def _ndjson(obj: dict[str, Any]) -> bytes:
+    """
+    Serializa un objeto a una línea NDJSON en UTF-8 preservando acentos.
+
+    orjson escribe UTF-8 directamente (sin escapar acentos) y en formato
+    compacto.
+    """
+    return orjson.dumps(obj) + b"\n"
+
+
 def _session_key() -> str:
     """Obtiene la clave de sesión usada para almacenar el último resultado."""
     return str(getattr(settings, "TCGEN_SESSION_KEY_RESULT", "tcgen_result"))
 
 
+def _store_result(request: HttpRequest, payload: dict[str, Any]) -> None:
+    """Guarda el último resultado en sesión con el CSV comprimido."""
+    stored = {key: value for key, value in payload.items() if key != "csv_out"}
+    csv_raw = (payload.get("csv_out") or "").encode("utf-8")
+    stored[SESSION_CSV_FIELD] = base64.b64encode(
+        zlib.compress(csv_raw, SESSION_CSV_ZLIB_LEVEL)
+    ).decode("ascii")
+
+    request.session[_session_key()] = stored
+    request.session.modified = True
+
+
+def _load_result_csv(payload: dict[str, Any]) -> bytes:
+    """
+    Recupera el CSV (UTF-8, sin BOM) del resultado guardado en sesión.
+
+    Acepta también sesiones previas con el CSV sin comprimir (csv_out).
+    """
+    packed = payload.get(SESSION_CSV_FIELD)
+    if packed:
+        return zlib.decompress(base64.b64decode(packed))
+    return (payload.get("csv_out") or "").encode("utf-8")
+
+
 def _json_error(*, status: int, code: str, message: str) -> JsonResponse:
     """Construye una respuesta JSON de error consistente para la UI."""
     return JsonResponse({"ok": False, "code": code, "message": message}, status=status)
@@ -79,6 +135,8 @@ def _validate_upload(*, filename: str, file_size: int) -> JsonResponse | None:
             message=vr.message or UI_ERR_PROMPT_FILE,
         )
 
+    from core.extractor import SUPPORTED_EXTS
+
     vr = validate_extension(filename, SUPPORTED_EXTS)
     if not vr.ok:
         return _json_error(
@@ -106,7 +164,24 @@ def _get_upload_or_error(
 
     Retorna (uploaded, filename, file_size, assigned_to) si es válido; de lo contrario,
     retorna una respuesta JsonResponse de error.
+
+    Si el Content-Length ya excede el límite, se rechaza sin tocar
+    request.FILES: el cuerpo no se parsea ni se copia a memoria o disco.
     """
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+
+    max_body = settings.MAX_UPLOAD_MB * 1024 * 1024 + UPLOAD_BODY_SLACK_BYTES
+    if content_length > max_body:
+        vr = validate_size(content_length, settings.MAX_UPLOAD_MB)
+        return _json_error(
+            status=400,
+            code="ERR_TOO_LARGE",
+            message=vr.message or UI_ERR_TOO_LARGE,
+        )
+
     uploaded = request.FILES.get("document")
     if not uploaded:
         return _json_error(status=400, code="ERR_NO_FILE", message=UI_ERR_NO_FILE)
@@ -129,6 +204,168 @@ def _get_upload_or_error(
     return uploaded, filename, file_size, assigned_to
 
 
+def _read_upload(uploaded: UploadedFile) -> tuple[bytes, str | None]:
+    """
+    Obtiene el contenido del archivo cargado sin duplicarlo en memoria.
+
+    Si Django ya guardó la carga en un archivo temporal (cargas mayores a
+    FILE_UPLOAD_MAX_MEMORY_SIZE), se usa su ruta y no se lee el contenido;
+    Django elimina ese archivo al cerrar la petición, después del streaming.
+
+    Retorna (file_bytes, file_path); solo uno de los dos trae valor.
+    """
+    temporary_file_path = getattr(uploaded, "temporary_file_path", None)
+    if temporary_file_path is not None:
+        return b"", temporary_file_path()
+    return uploaded.read(), None
+
+
+def _done_payload(evt: dict[str, Any]) -> dict[str, Any]:
+    """Construye, desde el evento final, el resultado que se guarda en sesión."""
+    return {
+        "filename": evt.get("filename") or "TC.csv",
+        "csv_out": evt.get("csv_out") or "",
+        "usage": evt.get("usage") or {},
+        "elapsed": evt.get("elapsed") or 0,
+        "stats": evt.get("stats") or {},
+    }
+
+
+def _stream_error_event() -> dict[str, Any]:
+    """Evento de error genérico para el stream NDJSON."""
+    return {"type": "error", "code": "ERR_ENGINE", "message": UI_ERR_ENGINE}
+
+
+def _iter_ndjson(
+    request: HttpRequest,
+    events: Iterator[dict[str, Any]],
+) -> Iterator[bytes]:
+    """
+    Serializa cada evento a NDJSON (ruta WSGI, sin hilo intermedio).
+
+    Al llegar el evento final guarda el CSV en sesión. Al cerrarse
+    (cliente desconectado) cierra también el iterador de eventos para que
+    el motor cancele los bloques pendientes.
+    """
+    try:
+        for evt in events:
+            if evt.get("type") == EVENT_DONE:
+                try:
+                    _store_result(request, _done_payload(evt))
+                except Exception:
+                    logger.exception("Storing the streamed result failed")
+                    yield _ndjson(_stream_error_event())
+                    return
+            yield _ndjson(evt)
+    finally:
+        close = getattr(events, "close", None)
+        if close is not None:
+            close()
+
+
+def _is_progress(item: Any) -> bool:
+    """Indica si un elemento de la cola es un evento de progreso."""
+    return isinstance(item, dict) and item.get("type") == EVENT_PROGRESS
+
+
+def _coalesce_progress(batch: list[Any]) -> list[Any]:
+    """
+    Descarta los eventos de progreso superados por uno posterior del lote.
+
+    La UI solo muestra el último progreso; meta/done/error (y la marca de
+    fin) se conservan siempre y en su orden.
+    """
+    progress_idx = [idx for idx, item in enumerate(batch) if _is_progress(item)]
+    if len(progress_idx) < 2:
+        return batch
+
+    last_progress = progress_idx[-1]
+    return [
+        item
+        for idx, item in enumerate(batch)
+        if idx >= last_progress or not _is_progress(item)
+    ]
+
+
+async def _aiter_events_in_thread(
+    events: Iterator[dict[str, Any]],
+    stop: threading.Event,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Consume un iterador de eventos bloqueante en un hilo y entrega sus
+    eventos al event loop a medida que llegan.
+
+    Así la espera del LLM no ocupa el event loop: un solo worker ASGI puede
+    atender varias generaciones a la vez. Si el cliente drena más lento de
+    lo que llegan los eventos, los progresos acumulados en la cola se
+    reducen al más reciente. Si el cliente se desconecta se activa stop: el
+    motor deja de enviar bloques al LLM y el hilo cierra el iterador.
+
+    El hilo productor no toca la sesión; al terminar cierra las conexiones
+    a BD que el motor hubiera abierto en él.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[object] = asyncio.Queue()
+
+    def produce() -> None:
+        try:
+            for item in events:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+                if stop.is_set():
+                    break
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+            close_old_connections()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+    producer = asyncio.ensure_future(
+        sync_to_async(produce, thread_sensitive=False)()
+    )
+    try:
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+
+            for item in _coalesce_progress(batch):
+                if item is _STREAM_END:
+                    await producer
+                    return
+                yield item
+    finally:
+        stop.set()
+
+
+async def _aiter_ndjson(
+    request: HttpRequest,
+    events: Iterator[dict[str, Any]],
+    stop: threading.Event,
+) -> AsyncIterator[bytes]:
+    """
+    Serializa a NDJSON los eventos del hilo productor (ruta ASGI).
+
+    El CSV final se guarda en sesión desde la vista, vía sync_to_async,
+    y no desde el hilo productor.
+    """
+    # aclosing: si el cliente se desconecta, el iterador interno se cierra
+    # de inmediato (activa stop) en lugar de esperar al recolector.
+    async with aclosing(_aiter_events_in_thread(events, stop)) as stream:
+        async for evt in stream:
+            if evt.get("type") == EVENT_DONE:
+                try:
+                    await sync_to_async(_store_result)(
+                        request, _done_payload(evt)
+                    )
+                except Exception:
+                    logger.exception("Storing the streamed result failed")
+                    yield _ndjson(_stream_error_event())
+                    return
+            yield _ndjson(evt)
+
+
 @require_http_methods(["GET"])
 def home(request: HttpRequest) -> HttpResponse:
     """Renderiza la pantalla principal del generador."""
@@ -149,10 +386,13 @@ def generate(request: HttpRequest) -> JsonResponse:
     uploaded, filename, _file_size, assigned_to = result
 
     try:
-        file_bytes = uploaded.read()
+        from tcgen.services.orchestrator import run_sync
+
+        file_bytes, file_path = _read_upload(uploaded)
         payload = run_sync(
             original_filename=filename,
             file_bytes=file_bytes,
+            file_path=file_path,
             assigned_to=assigned_to,
         )
 
@@ -163,8 +403,7 @@ def generate(request: HttpRequest) -> JsonResponse:
                 message=UI_ERR_EMPTY_OUTPUT,
             )
 
-        request.session[_session_key()] = payload
-        request.session.modified = True
+        _store_result(request, payload)
 
         return JsonResponse(
             {
@@ -188,55 +427,50 @@ def generate(request: HttpRequest) -> JsonResponse:
 
 
 @require_http_methods(["POST"])
-def generate_stream(request: HttpRequest) -> HttpResponse:
-    """Genera casos de prueba en modo streaming (NDJSON)."""
-    result = _get_upload_or_error(request)
+async def generate_stream(request: HttpRequest) -> HttpResponse:
+    """
+    Genera casos de prueba en modo streaming (NDJSON).
+
+    Bajo ASGI el motor (bloqueante) corre en un hilo y los eventos se
+    entregan con un iterador asíncrono; bajo WSGI se conserva el iterador
+    síncrono para que Django no tenga que consumirlo completo antes de
+    responder.
+    """
+    result = await sync_to_async(_get_upload_or_error)(request)
     if isinstance(result, JsonResponse):
         return result
 
     uploaded, filename, _file_size, assigned_to = result
-    file_bytes = uploaded.read()
-
-    def ndjson(obj: dict[str, Any]) -> str:
-        """Serializa un objeto a NDJSON preservando acentos."""
-        return json.dumps(obj, ensure_ascii=False) + "\n"
+    file_bytes, file_path = await sync_to_async(_read_upload)(uploaded)
 
-    def event_iter() -> Iterator[str]:
-        """
-        Itera eventos del motor y los emite como NDJSON.
+    # Se activa si el cliente abandona el stream (ruta ASGI).
+    stop = threading.Event()
 
-        Si llega un evento final, se guarda en sesión el CSV para descarga.
-        """
+    def event_iter() -> Iterator[dict[str, Any]]:
+        """Itera eventos del motor; un fallo se emite como evento de error."""
         try:
-            for evt in iter_stream(
+            # Import diferido: bajo ASGI ocurre en el hilo productor
+            from tcgen.services.orchestrator import iter_stream
+
+            yield from iter_stream(
                 original_filename=filename,
                 file_bytes=file_bytes,
+                file_path=file_path,
                 assigned_to=assigned_to,
-            ):
-                if evt.get("type") == EVENT_DONE:
-                    payload = {
-                        "filename": evt.get("filename") or "TC.csv",
-                        "csv_out": evt.get("csv_out") or "",
-                        "usage": evt.get("usage") or {},
-                        "elapsed": evt.get("elapsed") or 0,
-                        "stats": evt.get("stats") or {},
-                    }
-                    request.session[_session_key()] = payload
-                    request.session.modified = True
-
-                yield ndjson(evt)
+                cancel=stop,
+            )
 
         except Exception:
             logger.exception("Streaming generation failed")
-            yield ndjson(
-                {
-                    "type": "error",
-                    "code": "ERR_ENGINE",
-                    "message": UI_ERR_ENGINE,
-                }
-            )
+            yield _stream_error_event()
+
+    content: Iterator[bytes] | AsyncIterator[bytes]
+    if isinstance(request, ASGIRequest):
+        content = _aiter_ndjson(request, event_iter(), stop)
+    else:
+        content = _iter_ndjson(request, event_iter())
 
-    resp = StreamingHttpResponse(event_iter(), content_type=CONTENT_TYPE_NDJSON)
+    resp = StreamingHttpResponse(content, content_type=CONTENT_TYPE_NDJSON)
     resp["Cache-Control"] = "no-cache"
     resp["X-Accel-Buffering"] = "no"
     resp["X-Content-Type-Options"] = "nosniff"
@@ -257,16 +491,17 @@ def download_csv(request: HttpRequest) -> HttpResponse:
         )
 
     filename = payload.get("filename") or "TC.csv"
-    csv_out = payload.get("csv_out") or ""
+    csv_raw = _load_result_csv(payload)
 
-    if not csv_out.strip():
+    if not csv_raw.strip():
         return HttpResponse(
             "CSV content is empty. Please generate test cases again.",
             status=400,
             content_type=CONTENT_TYPE_TEXT,
         )
 
-    resp = HttpResponse(csv_out.encode("utf-8-sig"), content_type=CONTENT_TYPE_CSV)
+    csv_bytes = CSV_EXCEL_BOM + csv_raw
+    resp = HttpResponse(csv_bytes, content_type=CONTENT_TYPE_CSV)
     resp["Content-Disposition"] = f'attachment; filename="{filename}"'
     resp["X-Content-Type-Options"] = "nosniff"
     resp["Cache-Control"] = "no-store"